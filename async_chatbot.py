@@ -1,12 +1,28 @@
 import asyncio
-from langgraph.checkpoint.memory import MemorySaver
+import os
 from langgraph.graph import START, MessagesState, StateGraph
-from langchain.chat_models import init_chat_model
+from model_router import init_hedged_model
 from dotenv import load_dotenv
+from session_engine import ChatSessionEngine
+from sqlite_checkpointer import SQLiteSaver
+from instrumentation import Instrumentation
 from langchain_core.messages import HumanMessage
 
 load_dotenv()
-model = init_chat_model("gpt-4o-mini", model_provider="openai")
+# Comma-separated "provider:model" list; with several, requests are hedged
+model = init_hedged_model(os.getenv("CHAT_MODELS", "openai:gpt-4o-mini"))
+
+DEFAULT_THREAD = "abc123"
+
+
+def parse_query(query: str) -> tuple[str, str]:
+    """Split "@<thread_id> <message>" into its parts; other input goes to the
+    default thread."""
+    if query.startswith("@"):
+        thread_id, _, text = query[1:].partition(" ")
+        if thread_id and text.strip():
+            return thread_id, text.strip()
+    return DEFAULT_THREAD, query
 
 
 # Define the function that calls the model
@@ -15,7 +31,7 @@ async def call_model(state: MessagesState):
     return {"messages": response}
 
 
-async def main():
+def build_app(checkpointer):
     # Define a new graph
     workflow = StateGraph(state_schema=MessagesState)
 
@@ -23,22 +39,54 @@ async def main():
     workflow.add_edge(START, "model")
     workflow.add_node("model", call_model)
 
+    return workflow.compile(checkpointer=checkpointer)
+
+
+async def main():
+    # Timings are collected when METRICS_FILE or METRICS_PORT is set
+    metrics = Instrumentation.from_env().start()
+
     # Add memory
-    memory = MemorySaver()
-    app = workflow.compile(checkpointer=memory)
-
-    config = {"configurable": {"thread_id": "abc123"}}
-
-    while True:
-        query = input("You: ")
-        if query.lower() == "quit":
-            break
-        else:
-            input_messages = [HumanMessage(query)]
-            output = await app.ainvoke({"messages": input_messages}, config)
-            output["messages"][
-                -1
-            ].pretty_print()  # output contains all messages in state
+    memory = metrics.checkpointer(SQLiteSaver("async_chatbot_checkpoints.db"))
+    app = build_app(memory)
+
+    engine = ChatSessionEngine(app)
+    turns = set()
+
+    async def run_turn(thread_id, query):
+        input_messages = [HumanMessage(query)]
+        try:
+            output = await engine.submit(
+                thread_id,
+                {"messages": input_messages},
+                {"callbacks": metrics.callbacks()},
+            )
+        except Exception as e:
+            # Turns run in the background: report failures here or they are lost
+            print(f"[{thread_id}] Error: {e}")
+            return
+        output["messages"][-1].pretty_print()  # output contains all messages in state
+
+    # Start a message with "@<thread_id> " to talk in another conversation
+    try:
+        while True:
+            query = await asyncio.to_thread(input, "You: ")
+            if query.lower() == "quit":
+                break
+            thread_id, text = parse_query(query)
+            turn = asyncio.create_task(run_turn(thread_id, text))
+            turns.add(turn)
+            turn.add_done_callback(turns.discard)
+    except (EOFError, KeyboardInterrupt):
+        # Ctrl-D / Ctrl-C end the session like "quit"
+        print()
+    finally:
+        # Let the turns still running finish and print their replies
+        await asyncio.gather(*turns, return_exceptions=True)
+        # Commit the buffered checkpoints, so the conversation survives a restart
+        await engine.close()
+        memory.close()
+        metrics.close()
 
 
 if __name__ == "__main__":
@@ -1,12 +1,16 @@
 # -*- coding: windows-1252 -*-
 from dotenv import load_dotenv
 from langchain.chat_models import init_chat_model
+from response_cache import LRUSQLiteCache
 
 load_dotenv()
+response_cache = LRUSQLiteCache(maxsize=256, ttl=7 * 24 * 3600)
 
 
 def main():
-    model = init_chat_model("gpt-4o-mini", model_provider="openai")
+    model = init_chat_model(
+        "gpt-4o-mini", model_provider="openai", cache=response_cache
+    )
     # model = init_chat_model("claude-sonnet-4-20250514", model_provider="anthropic")
 
     messages = "Hello!"
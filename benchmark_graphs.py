@@ -0,0 +1,247 @@
+"""Offline micro-benchmarks for the example chat graphs.
+
+Every graph runs against ``FakeChatModel``, so the numbers show what the
+framework adds around ``call_model``: prompt rendering, ``add_messages``
+reduction, trimming/compaction and checkpoint writes. Results are printed as
+a table and written as JSON, which can be compared against an earlier run:
+
+    python benchmark_graphs.py --turns 200 --output bench.json
+    python benchmark_graphs.py --turns 200 --baseline bench.json
+"""
+
+import argparse
+import gc
+import importlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import uuid
+from importlib.metadata import PackageNotFoundError, version
+
+# The example modules build an OpenAI model at import time; it is never called
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from fake_chat_model import FakeChatModel
+from sqlite_checkpointer import SQLiteSaver
+
+# Graph name -> input of the first turn (later turns only send a message)
+GRAPHS = {
+    "chatbot": {},
+    "chatbot_with_template": {},
+    "chatbot_with_advanced_template": {"language": "English"},
+    "trmming_msgs": {"language": "English"},
+}
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def make_checkpointer(kind: str, directory: str, name: str):
+    if kind == "memory":
+        return MemorySaver()
+    return SQLiteSaver(os.path.join(directory, f"{name}.db"))
+
+
+def load_graph(name: str, model: FakeChatModel):
+    """Import an example module and point it at the fake model."""
+    module = importlib.import_module(name)
+    module.model = model
+    if hasattr(module, "compactor"):
+        module.compactor.model = model
+    return module
+
+
+def run_turns(app, first_input: dict, turns: int, track_allocations: bool):
+    """Run ``turns`` turns on a fresh thread and return one record per turn."""
+    config = {"configurable": {"thread_id": uuid.uuid4().hex}}
+    records = []
+    for turn in range(turns):
+        inputs = {"messages": [HumanMessage(f"Question number {turn}?")]}
+        if turn == 0:
+            inputs.update(first_input)
+        if track_allocations:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        output = app.invoke(inputs, config)
+        elapsed = time.perf_counter() - start
+        record = {"turn": turn, "history": len(output["messages"]), "seconds": elapsed}
+        if track_allocations:
+            current, peak = tracemalloc.get_traced_memory()
+            record["retained_bytes"] = current - before
+            record["peak_bytes"] = peak - before
+            record["traced_bytes"] = current
+        records.append(record)
+    return records
+
+
+def summarize(timed: list[dict], traced: list[dict], model_seconds: float) -> dict:
+    seconds = [r["seconds"] for r in timed]
+    overhead = [max(s - model_seconds, 0.0) for s in seconds]
+    summary = {
+        "turns": len(timed),
+        "final_history": timed[-1]["history"],
+        "mean_ms": statistics.fmean(seconds) * 1000,
+        "p50_ms": percentile(seconds, 0.50) * 1000,
+        "p95_ms": percentile(seconds, 0.95) * 1000,
+        "max_ms": max(seconds) * 1000,
+        "overhead_p50_ms": percentile(overhead, 0.50) * 1000,
+        "overhead_p95_ms": percentile(overhead, 0.95) * 1000,
+        "turns_per_second": len(seconds) / sum(seconds),
+    }
+    # Growth of per-turn time from the first to the last quarter of the run
+    quarter = max(len(seconds) // 4, 1)
+    summary["late_vs_early_ratio"] = statistics.fmean(
+        seconds[-quarter:]
+    ) / statistics.fmean(seconds[:quarter])
+    if traced:
+        summary["retained_bytes_per_turn"] = (
+            traced[-1]["traced_bytes"] - traced[0]["traced_bytes"]
+        ) / max(len(traced) - 1, 1)
+        summary["peak_bytes_max"] = max(r["peak_bytes"] for r in traced)
+    return summary
+
+
+def benchmark_graph(name: str, args, directory: str) -> dict:
+    model = FakeChatModel(
+        latency=args.latency,
+        token_latency=args.token_latency,
+        output_tokens=args.output_tokens,
+    )
+    module = load_graph(name, model)
+    checkpointer = make_checkpointer(args.checkpointer, directory, name)
+    app = module.build_app(checkpointer)
+    first_input = GRAPHS[name]
+    try:
+        run_turns(app, first_input, args.warmup, track_allocations=False)
+        timed = run_turns(app, first_input, args.turns, track_allocations=False)
+        traced = []
+        if not args.no_allocations:
+            # Separate pass: tracemalloc slows every allocation down
+            gc.collect()
+            tracemalloc.start()
+            try:
+                traced = run_turns(app, first_input, args.turns, True)
+            finally:
+                tracemalloc.stop()
+    finally:
+        if hasattr(checkpointer, "close"):
+            checkpointer.close()
+    for record, alloc in zip(timed, traced):
+        record.update({k: v for k, v in alloc.items() if k.endswith("_bytes")})
+    model_seconds = model.latency + model.token_latency * max(
+        model.output_tokens - 1, 0
+    )
+    return {
+        "summary": summarize(timed, traced, model_seconds),
+        "turns": timed,
+    }
+
+
+def environment() -> dict:
+    packages = {}
+    for package in ("langchain-core", "langgraph", "langgraph-checkpoint"):
+        try:
+            packages[package] = version(package)
+        except PackageNotFoundError:
+            packages[package] = None
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"python": platform.python_version(), "commit": commit, **packages}
+
+
+def compare(results: dict, baseline_path: str) -> None:
+    with open(baseline_path) as f:
+        baseline = json.load(f)["graphs"]
+    print(f"\nChange against {baseline_path} (overhead p50 / p95):")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]["summary"], result["summary"]
+        changes = []
+        for key in ("overhead_p50_ms", "overhead_p95_ms"):
+            if old[key]:
+                changes.append(f"{(new[key] - old[key]) / old[key]:+.1%}")
+            else:
+                changes.append("n/a")
+        print(f"  {name:32} {' / '.join(changes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "graphs", nargs="*", metavar="graph", help=f"any of {', '.join(GRAPHS)}"
+    )
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--output-tokens", type=int, default=20)
+    parser.add_argument(
+        "--checkpointer", choices=["memory", "sqlite"], default="sqlite"
+    )
+    parser.add_argument("--no-allocations", action="store_true")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare with")
+    args = parser.parse_args()
+    unknown = set(args.graphs) - set(GRAPHS)
+    if unknown:
+        parser.error(f"unknown graph(s): {', '.join(sorted(unknown))}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.graphs or GRAPHS:
+            results[name] = benchmark_graph(name, args, directory)
+
+    print(
+        f"{'graph':32} {'p50 ms':>8} {'p95 ms':>8} {'turns/s':>9} "
+        f"{'late/early':>10} {'KiB/turn':>9}"
+    )
+    for name, result in results.items():
+        s = result["summary"]
+        retained = s.get("retained_bytes_per_turn")
+        print(
+            f"{name:32} {s['p50_ms']:8.2f} {s['p95_ms']:8.2f} "
+            f"{s['turns_per_second']:9.1f} {s['late_vs_early_ratio']:10.2f} "
+            f"{'-' if retained is None else f'{retained / 1024:.1f}':>9}"
+        )
+
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "environment": environment(),
+                "settings": {
+                    k: v for k, v in vars(args).items() if k not in ("output",)
+                },
+                "graphs": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
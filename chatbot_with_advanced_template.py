@@ -1,25 +1,35 @@
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import START, MessagesState, StateGraph
 from langchain.chat_models import init_chat_model
 from dotenv import load_dotenv
+from sqlite_checkpointer import SQLiteSaver
+from instrumentation import Instrumentation
+from console_stream import print_reply
 from langchain_core.messages import HumanMessage
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.prompts import ChatPromptTemplate
 from typing import Sequence
 from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages
 from typing_extensions import Annotated, TypedDict
+from memory_compaction import MessageCompactor, summary_messages
+from prompt_prefix import PrefixCachedPrompt, supports_cache_control
+from rate_limits import model_rate_limits
 
 load_dotenv()
-model = init_chat_model("gpt-4o-mini", model_provider="openai")
-
-prompt_template = ChatPromptTemplate.from_messages(
-    [
-        (
-            "system",
-            "You are a helpful assistant. Answer all questions to the best of your ability in {language}.",
-        ),
-        MessagesPlaceholder(variable_name="messages"),
-    ]
+model = init_chat_model(
+    "gpt-4o-mini", model_provider="openai", **model_rate_limits("openai")
+)
+
+# Rendered once per language, so every request starts with the same prefix
+system_prompt = PrefixCachedPrompt(
+    ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                "You are a helpful assistant. Answer all questions to the best of your ability in {language}.",
+            ),
+        ]
+    ),
+    cache_control=supports_cache_control(model),
 )
 
 
@@ -27,49 +37,79 @@ prompt_template = ChatPromptTemplate.from_messages(
 class State(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]
     language: str
+    summary: str
+
+
+# Folds old messages into a summary in the background
+compactor = MessageCompactor(model, max_tokens=2000, keep_tokens=500)
 
 
 # Define the function that calls the model
 def call_model(state: State):
-    prompt = prompt_template.invoke(state)
+    # The summary goes after the cached prefix: it changes now and then
+    history = [*summary_messages(state.get("summary", "")), *state["messages"]]
+    prompt = system_prompt.render(history, language=state["language"])
     response = model.invoke(prompt)
+
     return {"messages": [response]}
 
 
-def main():
+def build_app(checkpointer):
     # Define a new graph
     workflow = StateGraph(state_schema=State)
 
-    # Define the (single) node in the graph
-    workflow.add_edge(START, "model")
+    # Compaction runs first, so the model sees the latest finished summary
+    workflow.add_edge(START, "compact")
+    workflow.add_node("compact", compactor.node)
+    workflow.add_edge("compact", "model")
     workflow.add_node("model", call_model)
 
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def main():
+    # Timings are collected when METRICS_FILE or METRICS_PORT is set
+    metrics = Instrumentation.from_env().start()
+
     # Add memory
-    memory = MemorySaver()
-    app = workflow.compile(checkpointer=memory)
+    memory = metrics.checkpointer(
+        SQLiteSaver("chatbot_with_advanced_template_checkpoints.db")
+    )
+    app = build_app(memory)
 
     # Set config
-    config = {"configurable": {"thread_id": "abc123"}}
+    config = {
+        "configurable": {"thread_id": "abc123"},
+        "callbacks": metrics.callbacks(),
+    }
 
     # Set Language
     language = ""
 
-    while True:
-        if not language:
-            language = input("Language preference: ")
-            query = input("You: ")
-            input_messages = [HumanMessage(query)]
-            output = app.invoke(
-                {"messages": input_messages, "language": language}, config
-            )
-        else:
-            query = input("You: ")
-            if query.lower() == "quit":
-                break
-            input_messages = [HumanMessage(query)]
-            output = app.invoke({"messages": input_messages}, config)
-
-        output["messages"][-1].pretty_print()
+    try:
+        while True:
+            if not language:
+                language = input("Language preference: ")
+                query = input("You: ")
+                input_messages = [HumanMessage(query)]
+                inputs = {"messages": input_messages, "language": language}
+            else:
+                query = input("You: ")
+                if query.lower() == "quit":
+                    break
+                input_messages = [HumanMessage(query)]
+                inputs = {"messages": input_messages}
+
+            # Prints the reply token by token as it is generated
+            print_reply(app, inputs, config)
+    except (EOFError, KeyboardInterrupt):
+        # Ctrl-D / Ctrl-C end the session like "quit"
+        print()
+    finally:
+        # Commit the buffered checkpoints, so the conversation survives a restart
+        compactor.shutdown()
+        memory.close()
+        metrics.close()
 
 
 if __name__ == "__main__":
@@ -1,12 +1,16 @@
-from langgraph.checkpoint.memory import MemorySaver
+import os
 from langgraph.graph import START, MessagesState, StateGraph
-from langchain.chat_models import init_chat_model
+from model_router import init_hedged_model
 from dotenv import load_dotenv
+from sqlite_checkpointer import SQLiteSaver
+from instrumentation import Instrumentation
+from console_stream import print_reply
 from langchain_core.messages import HumanMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
 load_dotenv()
-model = init_chat_model("gpt-4o-mini", model_provider="openai")
+# Comma-separated "provider:model" list; with several, requests are hedged
+model = init_hedged_model(os.getenv("CHAT_MODELS", "openai:gpt-4o-mini"))
 
 prompt_template = ChatPromptTemplate.from_messages(
     [
@@ -26,7 +30,7 @@ def call_model(state: MessagesState):
     return {"messages": response}
 
 
-def main():
+def build_app(checkpointer):
     # Define a new graph
     workflow = StateGraph(state_schema=MessagesState)
 
@@ -34,20 +38,38 @@ def main():
     workflow.add_edge(START, "model")
     workflow.add_node("model", call_model)
 
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def main():
+    # Timings are collected when METRICS_FILE or METRICS_PORT is set
+    metrics = Instrumentation.from_env().start()
+
     # Add memory
-    memory = MemorySaver()
-    app = workflow.compile(checkpointer=memory)
-
-    config = {"configurable": {"thread_id": "abc123"}}
-
-    while True:
-        query = input("You: ")
-        if query.lower() == "quit":
-            break
-        else:
-            input_messages = [HumanMessage(query)]
-            output = app.invoke({"messages": input_messages}, config)
-        output["messages"][-1].pretty_print()  # output contains all messages in state
+    memory = metrics.checkpointer(SQLiteSaver("chatbot_with_template_checkpoints.db"))
+    app = build_app(memory)
+
+    config = {
+        "configurable": {"thread_id": "abc123"},
+        "callbacks": metrics.callbacks(),
+    }
+
+    try:
+        while True:
+            query = input("You: ")
+            if query.lower() == "quit":
+                break
+            else:
+                input_messages = [HumanMessage(query)]
+                # Prints the reply token by token as it is generated
+                print_reply(app, {"messages": input_messages}, config)
+    except (EOFError, KeyboardInterrupt):
+        # Ctrl-D / Ctrl-C end the session like "quit"
+        print()
+    finally:
+        # Commit the buffered checkpoints, so the conversation survives a restart
+        memory.close()
+        metrics.close()
 
 
 if __name__ == "__main__":
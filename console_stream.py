@@ -0,0 +1,49 @@
+import os
+import sys
+from typing import Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.messages.base import get_msg_title_repr
+
+# Set CHAT_STREAMING=0 to print whole replies with pretty_print() instead
+STREAMING = os.getenv("CHAT_STREAMING", "1") != "0"
+
+
+def print_reply(
+    app, inputs: dict, config: dict, node: str = "model"
+) -> Optional[BaseMessage]:
+    """Run one turn of ``app`` and print the reply of ``node`` to the console.
+
+    With streaming on, tokens are written as the model produces them
+    (``stream_mode="messages"``), so the first words show up after the time to
+    first token instead of after the whole completion. The graph still runs
+    to the end, so the final message is saved by the checkpointer as usual.
+
+    Returns the reply.
+    """
+    if not STREAMING:
+        output = app.invoke(inputs, config)
+        output["messages"][-1].pretty_print()
+        return output["messages"][-1]
+
+    reply: Optional[AIMessage] = None
+    for message, metadata in app.stream(inputs, config, stream_mode="messages"):
+        if metadata.get("langgraph_node") != node:
+            continue
+        if not isinstance(message, AIMessageChunk):
+            # Not streamed by the model: the node's finished message
+            if isinstance(message, AIMessage):
+                message.pretty_print()
+                reply = message
+            continue
+        if reply is None:
+            print(get_msg_title_repr("Ai Message") + "\n")
+            reply = message
+        else:
+            reply += message
+        sys.stdout.write(message.text())
+        sys.stdout.flush()
+
+    if isinstance(reply, AIMessageChunk):
+        print()
+    return reply
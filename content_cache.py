@@ -0,0 +1,235 @@
+"""On-disk cache of downloaded and exported Drive file contents.
+
+Entries are keyed by file id and a version string built from the file's
+``modifiedTime`` and ``md5Checksum`` (Google Docs have no checksum), so the
+metadata-only ``files().get`` the tools make anyway is enough to tell whether
+a cached copy is still current. Contents are stored zlib-compressed, read
+back through ``mmap`` and decompressed only up to the range asked for; the
+least recently used entries are evicted once the cache grows past
+``max_bytes``.
+
+    version = content_version(file)
+    entry = content_cache.get(file_id, version)
+    if entry is None:
+        entry = content_cache.put(file_id, version, download_chunks())
+    text, next_offset, total = decode_text_range(entry.iter_chunks(offset), offset)
+"""
+
+import hashlib
+import mmap
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Iterable, Iterator, Optional
+
+# Compressed bytes fed to the decompressor at a time
+READ_BLOCK_SIZE = 64 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    file_id TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_access ON entries (last_access);
+"""
+
+
+def content_version(f: dict) -> str:
+    """Version of a file's content, from its Drive metadata."""
+    return f"{f.get('modifiedTime', '')}:{f.get('md5Checksum', '')}"
+
+
+class CachedContent:
+    """Cached content of one file version."""
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+
+    def iter_chunks(
+        self, offset: int = 0, chunk_size: int = READ_BLOCK_SIZE
+    ) -> Iterator[tuple[bytes, int]]:
+        """Yield ``(chunk, total_size)`` from byte ``offset``, decompressing
+        only as far as the caller reads."""
+        if offset >= self.size:
+            return
+        position = 0
+        pending = b""
+        for block in self._inflate(chunk_size):
+            if position + len(block) <= offset:
+                position += len(block)
+                continue
+            if position < offset:
+                block = block[offset - position :]
+                position = offset
+            pending += block
+            while len(pending) >= chunk_size:
+                yield pending[:chunk_size], self.size
+                pending = pending[chunk_size:]
+        if pending:
+            yield pending, self.size
+
+    def _inflate(self, max_length: int) -> Iterator[bytes]:
+        """Decompress the file in blocks of at most ``max_length`` bytes."""
+        with open(self.path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                decompressor = zlib.decompressobj()
+                for start in range(0, len(data), READ_BLOCK_SIZE):
+                    tail = data[start : start + READ_BLOCK_SIZE]
+                    # A well-compressed block inflates to many times its size
+                    while True:
+                        block = decompressor.decompress(tail, max_length)
+                        tail = decompressor.unconsumed_tail
+                        if block:
+                            yield block
+                        if not tail and len(block) < max_length:
+                            break
+                block = decompressor.flush()
+                if block:
+                    yield block
+
+    def read(self) -> bytes:
+        return b"".join(chunk for chunk, _ in self.iter_chunks())
+
+
+class ContentCache:
+    """Size-bounded LRU cache of file contents in a directory.
+
+    Args:
+        directory: Where the compressed contents and the index live.
+        max_bytes: Total compressed size kept on disk.
+        max_entry_bytes: Larger contents are not cached.
+        level: zlib compression level.
+    """
+
+    def __init__(
+        self,
+        directory: str = "drive_cache",
+        max_bytes: int = 256 * 1024 * 1024,
+        max_entry_bytes: int = 32 * 1024 * 1024,
+        level: int = 6,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.level = level
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(
+            os.path.join(directory, "index.db"), check_same_thread=False
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def get(self, file_id: str, version: str) -> Optional[CachedContent]:
+        """Return the cached content if it is of ``version``, else None."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT version, filename, size FROM entries WHERE file_id = ?",
+                (file_id,),
+            ).fetchone()
+            if row is None or row[0] != version:
+                return None
+            path = self._path(row[1])
+            if not os.path.exists(path):
+                self._drop(file_id)
+                self.conn.commit()
+                return None
+            self.conn.execute(
+                "UPDATE entries SET last_access = ? WHERE file_id = ?",
+                (time.time(), file_id),
+            )
+            self.conn.commit()
+        return CachedContent(path, row[2])
+
+    def put(
+        self, file_id: str, version: str, chunks: Iterable[bytes]
+    ) -> Optional[CachedContent]:
+        """Compress ``chunks`` into the cache as ``version`` of the file.
+
+        Returns None, caching nothing, if the content is larger than
+        ``max_entry_bytes``.
+        """
+        digest = hashlib.sha256(f"{file_id}\0{version}".encode()).hexdigest()[:32]
+        filename = f"{digest}.z"
+        tmp = self._path(f"{filename}.{threading.get_ident()}.tmp")
+        compressor = zlib.compressobj(self.level)
+        size = 0
+        try:
+            with open(tmp, "wb") as f:
+                for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_entry_bytes:
+                        raise _TooLarge
+                    f.write(compressor.compress(chunk))
+                f.write(compressor.flush())
+                stored_size = f.tell()
+        except _TooLarge:
+            os.remove(tmp)
+            return None
+        except BaseException:
+            os.remove(tmp)
+            raise
+        with self._lock:
+            self._drop(file_id)
+            os.replace(tmp, self._path(filename))
+            self.conn.execute(
+                "INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (file_id, version, filename, size, stored_size, time.time()),
+            )
+            self._evict()
+            self.conn.commit()
+        return CachedContent(self._path(filename), size)
+
+    def forget(self, file_id: str) -> None:
+        with self._lock:
+            self._drop(file_id)
+            self.conn.commit()
+
+    def _drop(self, file_id: str) -> None:
+        row = self.conn.execute(
+            "SELECT filename FROM entries WHERE file_id = ?", (file_id,)
+        ).fetchone()
+        if row is None:
+            return
+        self.conn.execute("DELETE FROM entries WHERE file_id = ?", (file_id,))
+        try:
+            os.remove(self._path(row[0]))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self) -> None:
+        total = self.conn.execute(
+            "SELECT COALESCE(SUM(stored_size), 0) FROM entries"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for file_id, stored_size in self.conn.execute(
+            "SELECT file_id, stored_size FROM entries ORDER BY last_access"
+        ).fetchall():
+            self._drop(file_id)
+            total -= stored_size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size, stored = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), "
+                "COALESCE(SUM(stored_size), 0) FROM entries"
+            ).fetchone()
+        return {"entries": entries, "bytes": size, "stored_bytes": stored}
+
+
+class _TooLarge(Exception):
+    pass
@@ -0,0 +1,210 @@
+"""Answer questions about long Drive documents with a few relevant chunks.
+
+A document is split into overlapping chunks, indexed with BM25 and, when an
+embeddings model is given, with vectors as well (both rankings are then
+merged by reciprocal rank fusion). Only the ``top_k`` best chunks go back to
+the agent, so the tool message, which stays in the conversation history,
+has a bounded size however long the document is.
+
+Indexes are cached per ``(file_id, modifiedTime)``: asking several
+questions about an unchanged file downloads and indexes it once.
+
+    index = document_indexes.get(file_id, file["modifiedTime"], load_text)
+    for hit in index.search("When is the deadline?", top_k=4):
+        print(hit.start, hit.text)
+"""
+
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from langchain_core.embeddings import Embeddings
+
+# Characters per chunk, and shared between neighbouring chunks
+CHUNK_CHARS = 1500
+CHUNK_OVERLAP = 200
+
+# Reciprocal rank fusion constant
+RRF_K = 60
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return _WORD.findall(text.lower())
+
+
+@dataclass
+class Chunk:
+    text: str
+    start: int
+    score: float = 0.0
+
+
+def split_text(
+    text: str, chunk_chars: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP
+) -> list[Chunk]:
+    """Split ``text`` into chunks of at most ``chunk_chars`` characters.
+
+    Chunks end at a paragraph, line or word break where there is one in the
+    second half of the window; each chunk repeats the last ``overlap``
+    characters of the previous one.
+    """
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_chars, len(text))
+        if end < len(text):
+            for sep in ("\n\n", "\n", " "):
+                cut = text.rfind(sep, start + chunk_chars // 2, end)
+                if cut != -1:
+                    end = cut + len(sep)
+                    break
+        if text[start:end].strip():
+            chunks.append(Chunk(text[start:end], start))
+        if end == len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+class DocumentIndex:
+    """BM25 index over the chunks of one document, optionally with vectors.
+
+    Args:
+        chunks: Chunks of the document, from ``split_text``.
+        embeddings: Embeddings model for the vector ranking, or None.
+        k1: BM25 term frequency saturation.
+        b: BM25 length normalization.
+    """
+
+    def __init__(
+        self,
+        chunks: list[Chunk],
+        embeddings: Optional[Embeddings] = None,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.chunks = chunks
+        self.embeddings = embeddings
+        self.k1 = k1
+        self.b = b
+        self._tfs = [Counter(tokenize(c.text)) for c in chunks]
+        self._lengths = [sum(tf.values()) for tf in self._tfs]
+        self._avg_length = sum(self._lengths) / len(chunks) if chunks else 0.0
+        df: Counter = Counter()
+        for tf in self._tfs:
+            df.update(tf.keys())
+        n = len(chunks)
+        self._idf = {
+            term: math.log(1 + (n - count + 0.5) / (count + 0.5))
+            for term, count in df.items()
+        }
+        self._vectors = (
+            embeddings.embed_documents([c.text for c in chunks])
+            if embeddings is not None and chunks
+            else None
+        )
+
+    @classmethod
+    def from_text(cls, text: str, **kwargs) -> "DocumentIndex":
+        return cls(split_text(text), **kwargs)
+
+    def bm25(self, query: str) -> list[float]:
+        terms = [t for t in set(tokenize(query)) if t in self._idf]
+        scores = []
+        for tf, length in zip(self._tfs, self._lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / (self._avg_length or 1))
+            scores.append(
+                sum(
+                    self._idf[t] * tf[t] * (self.k1 + 1) / (tf[t] + norm)
+                    for t in terms
+                    if t in tf
+                )
+            )
+        return scores
+
+    def _cosine(self, query: str) -> list[float]:
+        q = self.embeddings.embed_query(query)
+        q_norm = math.sqrt(sum(x * x for x in q)) or 1.0
+        scores = []
+        for v in self._vectors:
+            v_norm = math.sqrt(sum(x * x for x in v)) or 1.0
+            scores.append(sum(a * b for a, b in zip(q, v)) / (q_norm * v_norm))
+        return scores
+
+    def search(self, query: str, top_k: int = 4) -> list[Chunk]:
+        """Return the ``top_k`` chunks most relevant to ``query``, best first."""
+        lexical = self.bm25(query)
+        if self._vectors is None:
+            scores = lexical
+        else:
+            scores = [0.0] * len(self.chunks)
+            for ranking in (lexical, self._cosine(query)):
+                order = sorted(range(len(ranking)), key=ranking.__getitem__)
+                for rank, i in enumerate(reversed(order)):
+                    scores[i] += 1 / (RRF_K + rank + 1)
+        best = sorted(range(len(scores)), key=scores.__getitem__, reverse=True)
+        return [
+            Chunk(self.chunks[i].text, self.chunks[i].start, scores[i])
+            for i in best[:top_k]
+            if scores[i] > 0
+        ]
+
+
+class DocumentIndexCache:
+    """LRU cache of document indexes keyed by file id and modification time.
+
+    A new ``modified_time`` for a file replaces its index. Concurrent
+    requests for the same key share one download and build.
+    """
+
+    def __init__(self, maxsize: int = 32, embeddings: Optional[Embeddings] = None):
+        self.maxsize = maxsize
+        self.embeddings = embeddings
+        self._indexes: OrderedDict[tuple[str, str], Future] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self, file_id: str, modified_time: Optional[str], load_text: Callable[[], str]
+    ) -> DocumentIndex:
+        key = (file_id, modified_time or "")
+        with self._lock:
+            future = self._indexes.get(key)
+            owner = future is None
+            if owner:
+                # Older versions of the file are no longer useful
+                for stale in [k for k in self._indexes if k[0] == file_id]:
+                    del self._indexes[stale]
+                future = self._indexes[key] = Future()
+                while len(self._indexes) > self.maxsize:
+                    self._indexes.popitem(last=False)
+            else:
+                self._indexes.move_to_end(key)
+        if owner:
+            try:
+                future.set_result(
+                    DocumentIndex.from_text(load_text(), embeddings=self.embeddings)
+                )
+            except BaseException as e:
+                with self._lock:
+                    if self._indexes.get(key) is future:
+                        del self._indexes[key]
+                future.set_exception(e)
+        return future.result()
+
+
+def format_chunks(name: str, chunks: list[Chunk], total: int) -> str:
+    if not chunks:
+        return f"Nothing in '{name}' matches the question."
+    parts = [f"Most relevant parts of '{name}' ({len(chunks)} of {total} passages):"]
+    for chunk in chunks:
+        parts.append(
+            f"[characters {chunk.start}-{chunk.start + len(chunk.text)}]\n"
+            f"{chunk.text.strip()}"
+        )
+    return "\n\n".join(parts)
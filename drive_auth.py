@@ -0,0 +1,244 @@
+import asyncio
+import os
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Any, Callable, Optional
+
+import httplib2
+from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build
+
+# Google Drive OAuth2 setup
+SCOPES = ["https://www.googleapis.com/auth/drive"]
+TOKEN_FILE = "token.pickle"
+CLIENT_SECRETS_FILE = "credentials.json"  # Download this from Google Cloud Console
+
+# Refresh the access token this long before it expires
+REFRESH_MARGIN = timedelta(minutes=5)
+
+# Seconds before a Drive HTTP request times out
+HTTP_TIMEOUT = 60
+
+
+def save_credentials(creds) -> None:
+    with open(TOKEN_FILE, "wb") as token:
+        pickle.dump(creds, token)
+
+
+class DriveAuthError(RuntimeError):
+    """No usable Google Drive credentials without asking the user."""
+
+
+def load_credentials(interactive: bool = True):
+    """Load stored credentials, refreshing or running the OAuth flow if needed.
+
+    With ``interactive=False`` the OAuth flow (which waits for the user) is
+    never started; ``DriveAuthError`` is raised instead.
+    """
+    creds = None
+
+    # Token file stores the user's access and refresh tokens
+    if os.path.exists(TOKEN_FILE):
+        with open(TOKEN_FILE, "rb") as token:
+            creds = pickle.load(token)
+
+    # If there are no (valid) credentials available, let the user log in
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+        elif not interactive:
+            raise DriveAuthError(
+                f"No valid Google Drive token in {TOKEN_FILE}; "
+                "run `python drive_auth.py` to authorize"
+            )
+        else:
+            # Create the flow using the client secrets file
+            flow = InstalledAppFlow.from_client_secrets_file(
+                CLIENT_SECRETS_FILE, SCOPES
+            )
+
+            try:
+                # Try to run local server without opening browser
+                creds = flow.run_local_server(
+                    port=0,  # Use any available port
+                    open_browser=False,  # Don't try to open browser automatically
+                )
+            except Exception:
+                # Fall back to manual authentication
+                print("\n=== Manual Google Drive Authentication ===")
+                auth_url, _ = flow.authorization_url(
+                    access_type="offline", include_granted_scopes="true"
+                )
+
+                print(f"\n1. Open this URL in your browser:\n{auth_url}")
+                print("\n2. Grant permissions and copy the authorization code")
+                code = input("\n3. Enter the authorization code here: ")
+
+                # Exchange code for token
+                flow.fetch_token(code=code)
+                creds = flow.credentials
+
+        # Save the credentials for the next run
+        save_credentials(creds)
+
+    return creds
+
+
+def build_drive_service(creds):
+    """Build a Drive v3 service from the discovery document bundled with the client.
+
+    The service gets its own keep-alive HTTP connection, so it must only be
+    used from one thread at a time.
+    """
+    http = AuthorizedHttp(creds, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+    return build("drive", "v3", http=http, static_discovery=True, cache_discovery=False)
+
+
+def authenticate_google_drive():
+    """Authenticate and return Google Drive service object"""
+    return build_drive_service(load_credentials())
+
+
+class DriveServiceProvider:
+    """Create Drive services on first use and keep their token fresh.
+
+    httplib2 connections are not thread-safe, so every thread gets its own
+    service with its own keep-alive connection, all sharing one set of
+    credentials. Nothing touches the network or the token file until ``get``
+    is first called. Once credentials are loaded, a daemon timer refreshes the
+    access token ``REFRESH_MARGIN`` before it expires, so requests never wait
+    on a refresh.
+
+    ``get`` runs inside tool calls, so it never starts the interactive OAuth
+    flow, and a failure to load credentials is remembered: later calls fail
+    fast instead of retrying. Call ``authorize`` up front (on the main
+    thread) to log in.
+
+    Args:
+        factory: Optional callable returning a service for the current thread
+            (e.g. a ``FakeDriveService``); skips authentication entirely.
+    """
+
+    def __init__(self, factory: Optional[Callable[[], Any]] = None):
+        self.factory = factory
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._creds = None
+        self._error: Optional[Exception] = None
+        self._timer: Optional[threading.Timer] = None
+
+    def credentials(self, interactive: bool = False):
+        """Return the shared credentials, loading them on first use.
+
+        Raises the remembered error if loading failed before, unless
+        ``interactive`` asks to try again with the OAuth flow.
+        """
+        if self._creds is not None:
+            return self._creds
+        with self._lock:
+            if self._creds is None:
+                if self._error is not None and not interactive:
+                    raise self._error
+                try:
+                    self._creds = load_credentials(interactive=interactive)
+                except Exception as e:
+                    self._error = e
+                    print(f"Google Drive authentication failed: {e}")
+                    print(
+                        "Please ensure you have credentials.json from Google Cloud Console"
+                    )
+                    raise
+                self._error = None
+                self._schedule_refresh()
+                print("Google Drive authentication successful!")
+        return self._creds
+
+    def authorize(self):
+        """Load credentials, running the interactive OAuth flow if needed."""
+        return self.credentials(interactive=True)
+
+    def get(self):
+        """Return this thread's Drive service, or None if authentication failed."""
+        service = getattr(self._local, "service", None)
+        if service is None:
+            if self.factory is not None:
+                service = self.factory()
+            else:
+                try:
+                    creds = self.credentials()
+                except Exception:
+                    return None
+                service = build_drive_service(creds)
+            self._local.service = service
+        return service
+
+    def _schedule_refresh(self) -> None:
+        creds = self._creds
+        if not getattr(creds, "refresh_token", None) or creds.expiry is None:
+            return
+        # google-auth keeps expiry as a naive UTC datetime
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        delay = (creds.expiry - REFRESH_MARGIN - now).total_seconds()
+        self._timer = threading.Timer(max(delay, 0), self._refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _refresh(self) -> None:
+        try:
+            self._creds.refresh(Request())
+            save_credentials(self._creds)
+        except Exception as e:
+            print(f"Google Drive token refresh failed: {e}")
+            return
+        self._schedule_refresh()
+
+    def close(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+
+
+_provider = DriveServiceProvider()
+
+# Worker threads running Drive calls for async callers, one service per worker
+DRIVE_POOL_SIZE = int(os.getenv("DRIVE_POOL_SIZE", "8"))
+_pool = ThreadPoolExecutor(max_workers=DRIVE_POOL_SIZE, thread_name_prefix="drive")
+
+
+def get_drive_service():
+    """Return the calling thread's lazily created Drive service (None if unavailable)."""
+    return _provider.get()
+
+
+def authorize_drive() -> None:
+    """Log in to Google Drive now, prompting the user if there is no valid token."""
+    if _provider.factory is None:
+        _provider.authorize()
+
+
+def use_drive_service_factory(factory: Optional[Callable[[], Any]]) -> None:
+    """Serve Drive services from ``factory`` instead of authenticating (for tests)."""
+    global _provider
+    _provider.close()
+    _provider = DriveServiceProvider(factory)
+
+
+def configure_drive_pool(size: int) -> None:
+    """Resize the worker pool used by ``run_in_drive_pool``."""
+    global _pool
+    old, _pool = _pool, ThreadPoolExecutor(max_workers=size, thread_name_prefix="drive")
+    old.shutdown(wait=False)
+
+
+async def run_in_drive_pool(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking Drive call on the worker pool without blocking the loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool, partial(func, *args, **kwargs))
+
+
+if __name__ == "__main__":
+    authorize_drive()
@@ -0,0 +1,259 @@
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from drive_query import MAX_PAGE_SIZE, Timestamp, _timestamp, build_query, iter_files
+
+FILE_FIELDS = "id, name, mimeType, modifiedTime, size, trashed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    mime_type TEXT NOT NULL,
+    modified_time TEXT,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS files_modified ON files (modified_time);
+CREATE INDEX IF NOT EXISTS files_mime ON files (mime_type, modified_time);
+CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5 (
+    name, content='files', content_rowid='rowid', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS files_ai AFTER INSERT ON files BEGIN
+    INSERT INTO files_fts (rowid, name) VALUES (new.rowid, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS files_ad AFTER DELETE ON files BEGIN
+    INSERT INTO files_fts (files_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS files_au AFTER UPDATE ON files BEGIN
+    INSERT INTO files_fts (files_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+    INSERT INTO files_fts (rowid, name) VALUES (new.rowid, new.name);
+END;
+CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def _drive_time(value: Timestamp) -> str:
+    """``value`` in Drive's ``modifiedTime`` format, to compare as strings."""
+    value = _timestamp(value)
+    if "." not in value:
+        value += ".000"
+    return f"{value}Z"
+
+
+class DriveMetadataIndex:
+    """Local SQLite index of Google Drive file metadata.
+
+    The index is seeded once with a full listing and then kept current with
+    Drive's changes feed, using the page token stored alongside the data.
+    Searches and listings are answered locally; ``sync`` only asks Drive for
+    the changes since the last call, and at most every ``max_age`` seconds.
+    Drive is called outside the lock guarding the database, so searches never
+    wait for the network; one sync runs at a time.
+
+    Args:
+        service: Drive v3 service (or ``FakeDriveService``), or a callable
+            returning the service to use from the calling thread.
+        path: SQLite database file.
+        max_age: Minimum seconds between two change feed polls.
+    """
+
+    def __init__(self, service, path: str = "drive_index.db", max_age: float = 10.0):
+        self.service = service
+        self.max_age = max_age
+        self._last_sync = 0.0
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def _service(self):
+        return self.service() if callable(self.service) else self.service
+
+    def _get_state(self, key: str) -> Optional[str]:
+        row = self.conn.execute(
+            "SELECT value FROM sync_state WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, key: str, value: str) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, value)
+        )
+
+    def _upsert(self, f: dict) -> None:
+        if f.get("trashed"):
+            self._remove(f["id"])
+            return
+        self.conn.execute(
+            "INSERT INTO files (id, name, mime_type, modified_time, size) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET "
+            "name = excluded.name, mime_type = excluded.mime_type, "
+            "modified_time = excluded.modified_time, size = excluded.size "
+            # A change fetched before one of our own writes must not undo it
+            "WHERE files.modified_time IS NULL OR excluded.modified_time IS NULL "
+            "OR excluded.modified_time >= files.modified_time",
+            (
+                f["id"],
+                f.get("name", ""),
+                f.get("mimeType", ""),
+                f.get("modifiedTime"),
+                int(f["size"]) if f.get("size") is not None else None,
+            ),
+        )
+
+    def _remove(self, file_id: str) -> None:
+        self.conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def _seed(self) -> None:
+        # Take the token first so changes made while listing are replayed
+        token = self._service().changes().getStartPageToken().execute()
+        files = list(
+            iter_files(
+                self._service(),
+                build_query(),
+                fields=FILE_FIELDS,
+                page_size=MAX_PAGE_SIZE,
+            )
+        )
+        with self._lock:
+            self.conn.execute("DELETE FROM files")
+            for f in files:
+                self._upsert(f)
+            self._set_state("page_token", token["startPageToken"])
+            self.conn.commit()
+        self._last_sync = time.monotonic()
+
+    def seed(self) -> None:
+        """Load the full listing and remember where the changes feed starts."""
+        with self._sync_lock:
+            self._seed()
+
+    def _fetch_changes(self, page_token: str) -> tuple[list[dict], Optional[str]]:
+        changes, new_token = [], None
+        while page_token:
+            result = (
+                self._service()
+                .changes()
+                .list(
+                    pageToken=page_token,
+                    pageSize=1000,
+                    fields=(
+                        "nextPageToken, newStartPageToken, "
+                        f"changes(fileId, removed, file({FILE_FIELDS}))"
+                    ),
+                )
+                .execute()
+            )
+            changes.extend(result.get("changes", []))
+            new_token = result.get("newStartPageToken", new_token)
+            page_token = result.get("nextPageToken")
+        return changes, new_token
+
+    def sync(self, force: bool = False) -> int:
+        """Apply pending changes from Drive and return how many were applied."""
+        with self._sync_lock:
+            # Checked under the lock so concurrent first syncs seed only once
+            with self._lock:
+                page_token = self._get_state("page_token")
+            if page_token is None:
+                self._seed()
+                return 0
+            if not force and time.monotonic() - self._last_sync < self.max_age:
+                return 0
+            changes, new_token = self._fetch_changes(page_token)
+            with self._lock:
+                for change in changes:
+                    if change.get("removed") or "file" not in change:
+                        self._remove(change["fileId"])
+                    else:
+                        self._upsert(change["file"])
+                if new_token:
+                    self._set_state("page_token", new_token)
+                self.conn.commit()
+            self._last_sync = time.monotonic()
+        return len(changes)
+
+    def record(self, f: dict) -> None:
+        """Write-through a file created or updated by one of our own calls."""
+        with self._lock:
+            self._upsert(f)
+            self.conn.commit()
+
+    def forget(self, file_id: str) -> None:
+        """Drop a file deleted by one of our own calls."""
+        with self._lock:
+            self._remove(file_id)
+            self.conn.commit()
+
+    def _rows(self, sql: str, params: tuple) -> list[dict]:
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [
+            {
+                "id": row[0],
+                "name": row[1],
+                "mimeType": row[2],
+                "modifiedTime": row[3],
+                "size": row[4],
+            }
+            for row in rows
+        ]
+
+    def search(
+        self,
+        query: str,
+        mime_type: Optional[str] = None,
+        modified_after: Optional[Timestamp] = None,
+        limit: int = 10,
+    ) -> list[dict]:
+        """Find files whose name contains words starting with the query terms."""
+        if not query.split():
+            return self.recent(limit, mime_type, modified_after)
+        terms = " ".join(
+            '"{}"*'.format(term.replace('"', '""')) for term in query.split()
+        )
+        sql = (
+            "SELECT f.id, f.name, f.mime_type, f.modified_time, f.size FROM files_fts "
+            "JOIN files f ON f.rowid = files_fts.rowid WHERE files_fts MATCH ?"
+        )
+        params: tuple = (terms,)
+        if mime_type:
+            sql += " AND f.mime_type = ?"
+            params += (mime_type,)
+        if modified_after:
+            sql += " AND f.modified_time > ?"
+            params += (_drive_time(modified_after),)
+        sql += " ORDER BY f.modified_time DESC LIMIT ?"
+        return self._rows(sql, params + (limit,))
+
+    def recent(
+        self,
+        limit: int = 10,
+        mime_type: Optional[str] = None,
+        modified_after: Optional[Timestamp] = None,
+    ) -> list[dict]:
+        """Return the most recently modified files."""
+        sql = "SELECT id, name, mime_type, modified_time, size FROM files"
+        clauses = []
+        params: tuple = ()
+        if mime_type:
+            clauses.append("mime_type = ?")
+            params += (mime_type,)
+        if modified_after:
+            clauses.append("modified_time > ?")
+            params += (_drive_time(modified_after),)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY modified_time DESC LIMIT ?"
+        return self._rows(sql, params + (limit,))
+
+    def get(self, file_id: str) -> Optional[dict]:
+        rows = self._rows(
+            "SELECT id, name, mime_type, modified_time, size FROM files WHERE id = ?",
+            (file_id,),
+        )
+        return rows[0] if rows else None
@@ -0,0 +1,124 @@
+"""Build Drive search queries safely and walk their results lazily.
+
+    q = build_query(name_contains="report", parent=folder_id)
+    for f in iter_files(drive_service, q, fields="id, name", limit=50):
+        print(f["name"])
+
+Pages are requested only as the caller consumes results and never more
+than ``limit`` files are fetched, so a large drive is not listed in full to
+find the first few matches.
+"""
+
+from datetime import datetime, timezone
+from typing import Iterator, Optional, Sequence, Union
+
+# Fields the Drive tools need from a listing
+DEFAULT_FIELDS = "id, name, mimeType, modifiedTime"
+
+# Largest page Drive returns for files().list
+MAX_PAGE_SIZE = 1000
+
+Timestamp = Union[str, datetime]
+
+
+def quote(value: str) -> str:
+    """Quote a string for a Drive query, escaping backslashes and quotes."""
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def _timestamp(value: Timestamp) -> str:
+    """UTC time without offset, e.g. ``2024-05-01T12:00:00``."""
+    if isinstance(value, str):
+        try:
+            # Also turns bare dates, which Drive rejects, into midnight
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(timespec="milliseconds" if value.microsecond else "seconds")
+
+
+def build_query(
+    name_contains: Optional[str] = None,
+    full_text: Optional[str] = None,
+    mime_type: Union[str, Sequence[str], None] = None,
+    modified_after: Optional[Timestamp] = None,
+    modified_before: Optional[Timestamp] = None,
+    parent: Optional[str] = None,
+    trashed: Optional[bool] = False,
+) -> str:
+    """Combine filters into a Drive ``q`` string; every value is quoted.
+
+    Timestamps are RFC 3339 strings or datetimes (naive ones are taken as
+    UTC). Several mime types match any of them.
+    """
+    clauses = []
+    if name_contains:
+        clauses.append(f"name contains {quote(name_contains)}")
+    if full_text:
+        clauses.append(f"fullText contains {quote(full_text)}")
+    if isinstance(mime_type, str):
+        clauses.append(f"mimeType = {quote(mime_type)}")
+    elif mime_type:
+        alternatives = " or ".join(f"mimeType = {quote(m)}" for m in mime_type)
+        clauses.append(f"({alternatives})" if len(mime_type) > 1 else alternatives)
+    if modified_after is not None:
+        clauses.append(f"modifiedTime > {quote(_timestamp(modified_after))}")
+    if modified_before is not None:
+        clauses.append(f"modifiedTime < {quote(_timestamp(modified_before))}")
+    if parent:
+        clauses.append(f"{quote(parent)} in parents")
+    if trashed is not None:
+        clauses.append(f"trashed = {str(trashed).lower()}")
+    return " and ".join(clauses)
+
+
+def iter_files(
+    service,
+    q: Optional[str] = None,
+    fields: str = DEFAULT_FIELDS,
+    limit: Optional[int] = None,
+    page_size: int = 100,
+    order_by: Optional[str] = None,
+    **list_args,
+) -> Iterator[dict]:
+    """Yield the files matching ``q``, fetching one page at a time.
+
+    Args:
+        service: Drive v3 service.
+        q: Query, e.g. from ``build_query``.
+        fields: Fields of each file to return.
+        limit: Maximum number of files; the last page is shrunk to fit.
+        page_size: Files per request, at most ``MAX_PAGE_SIZE``.
+        order_by: Sort order, e.g. ``"modifiedTime desc"``.
+        list_args: Further ``files().list`` parameters (``corpora``, ...).
+    """
+    if q:
+        list_args["q"] = q
+    if order_by:
+        list_args["orderBy"] = order_by
+    page_size = min(page_size, MAX_PAGE_SIZE)
+    page_token = None
+    remaining = limit
+    while remaining is None or remaining > 0:
+        if page_token:
+            list_args["pageToken"] = page_token
+        result = (
+            service.files()
+            .list(
+                pageSize=page_size if remaining is None else min(page_size, remaining),
+                fields=f"nextPageToken, files({fields})",
+                **list_args,
+            )
+            .execute()
+        )
+        for f in result.get("files", []):
+            yield f
+            if remaining is not None:
+                remaining -= 1
+                if remaining == 0:
+                    return
+        page_token = result.get("nextPageToken")
+        if not page_token:
+            return
@@ -0,0 +1,152 @@
+import codecs
+from tempfile import SpooledTemporaryFile
+from typing import Iterable, Iterator, Optional
+
+from googleapiclient.errors import HttpError
+
+DEFAULT_CHUNK_SIZE = 256 * 1024
+
+
+def iter_media_chunks(
+    request, chunk_size: int = DEFAULT_CHUNK_SIZE, offset: int = 0
+) -> Iterator[tuple[bytes, Optional[int]]]:
+    """Download a media request chunk by chunk, starting at byte ``offset``.
+
+    Works like ``MediaIoBaseDownload.next_chunk`` (one ranged GET per chunk)
+    but yields ``(chunk, total_size)`` instead of writing to a file, so the
+    caller can stop at any point and only one chunk is held in memory.
+
+    Exports of Google Docs ignore the range header and return the whole
+    document in one response; it is then sliced locally.
+    """
+    headers = {
+        k: v
+        for k, v in request.headers.items()
+        if k.lower() not in ("accept", "accept-encoding", "user-agent")
+    }
+    uri = request.uri
+    position = offset
+    while True:
+        headers["range"] = f"bytes={position}-{position + chunk_size - 1}"
+        resp, content = request.http.request(uri, "GET", headers=headers)
+
+        if resp.status == 416:
+            # Range Not Satisfiable: empty file or offset past the end
+            return
+        if resp.status not in (200, 206):
+            raise HttpError(resp, content, uri=uri)
+        if "content-location" in resp and resp["content-location"] != uri:
+            uri = resp["content-location"]
+
+        if resp.status == 200:
+            # Range was ignored, the full body came back
+            total = len(content)
+            for start in range(position, total, chunk_size):
+                yield content[start : start + chunk_size], total
+            return
+
+        total = int(resp["content-range"].rsplit("/", 1)[1])
+        position += len(content)
+        yield content, total
+        if not content or position >= total:
+            return
+
+
+class SpooledDownload:
+    """A media download that keeps the bytes read so far, to read them again.
+
+    Iterating it yields the raw chunks (e.g. into ``ContentCache.put``); if
+    that stops early, ``iter_chunks`` replays the kept bytes and then goes on
+    with the same download, so nothing is fetched twice. Kept bytes stay in
+    memory up to ``max_memory``, in a temporary file beyond that.
+    """
+
+    def __init__(
+        self,
+        request,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_memory: int = 4 * 1024 * 1024,
+    ):
+        self.chunk_size = chunk_size
+        self.total: Optional[int] = None
+        self._download = iter_media_chunks(request, chunk_size)
+        self._spool = SpooledTemporaryFile(max_size=max_memory)
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk, self.total in self._download:
+            self._spool.write(chunk)
+            yield chunk
+
+    def iter_chunks(self, offset: int = 0) -> Iterator[tuple[bytes, Optional[int]]]:
+        """Yield ``(chunk, total_size)`` from byte ``offset``."""
+        kept = self._spool.tell()
+        self._spool.seek(offset)
+        while self._spool.tell() < kept:
+            yield self._spool.read(self.chunk_size), self.total
+        position = kept
+        for chunk, self.total in self._download:
+            if position + len(chunk) > offset:
+                yield chunk[max(0, offset - position) :], self.total
+            position += len(chunk)
+
+    def close(self) -> None:
+        self._spool.close()
+
+
+def read_text_range(
+    request,
+    offset: int = 0,
+    max_chars: int = 50_000,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> tuple[str, int, Optional[int]]:
+    """Read up to ``max_chars`` characters of UTF-8 text from byte ``offset``.
+
+    Decoding is incremental, and downloading stops as soon as the budget is
+    reached.
+
+    Returns:
+        The text, the byte offset to continue from and the total size in
+        bytes (None if unknown).
+
+    Raises:
+        UnicodeDecodeError: If the content is not UTF-8 text.
+    """
+    return decode_text_range(
+        iter_media_chunks(request, chunk_size, offset), offset, max_chars
+    )
+
+
+def decode_text_range(
+    chunks: Iterable[tuple[bytes, Optional[int]]],
+    offset: int = 0,
+    max_chars: int = 50_000,
+) -> tuple[str, int, Optional[int]]:
+    """Like ``read_text_range``, for ``(chunk, total_size)`` pairs starting at
+    byte ``offset`` from any source (e.g. a local cache)."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parts: list[str] = []
+    chars = 0
+    consumed = offset
+    total = None
+    first = True
+    for chunk, total in chunks:
+        if first:
+            first = False
+            # Skip continuation bytes if the offset is in the middle of a character
+            skip = 0
+            while skip < len(chunk) and skip < 3 and 0x80 <= chunk[skip] < 0xC0:
+                skip += 1
+            chunk = chunk[skip:]
+            consumed += skip
+        pending = len(decoder.getstate()[0])
+        text = decoder.decode(chunk)
+        if chars + len(text) >= max_chars:
+            keep = text[: max_chars - chars]
+            parts.append(keep)
+            consumed += len(keep.encode("utf-8")) - pending
+            return "".join(parts), consumed, total
+        parts.append(text)
+        chars += len(text)
+        consumed += len(chunk)
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts), consumed, total
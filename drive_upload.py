@@ -0,0 +1,231 @@
+"""Size-adaptive media uploads for the Drive tools.
+
+Payloads up to ``MULTIPART_THRESHOLD`` go out as a single multipart request
+(metadata and content together, one round trip). Larger ones use Drive's
+resumable protocol in ``chunk_size`` pieces read straight from a file or a
+spooled copy of a generator, so memory use does not grow with the upload.
+
+    media = media_from_path("report.csv", "text/csv")
+    request = drive_service.files().create(body={"name": "report"}, media_body=media)
+    file = execute_upload(request, key=upload_key("report.csv"), sessions=sessions)
+
+A resumable upload interrupted by an error continues from the last byte the
+server acknowledged; with ``sessions`` it also survives a restart of the
+process, as long as the same content is uploaded under the same key.
+"""
+
+import io
+import json
+import os
+import threading
+import time
+from tempfile import SpooledTemporaryFile
+from typing import Callable, Iterable, Optional
+
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
+
+from rate_limits import backoff_delay, limiter, retry_delay
+
+# Drive's recommended limit for multipart uploads
+MULTIPART_THRESHOLD = 5 * 1024 * 1024
+
+# Bytes per resumable request, must be a multiple of 256 KiB
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Statuses meaning the resumable session is gone and must be restarted
+EXPIRED_STATUSES = {404, 410}
+
+
+def _media(
+    fh, mimetype: str, size: int, threshold: int, chunk_size: int
+) -> MediaIoBaseUpload:
+    resumable = size > threshold
+    return MediaIoBaseUpload(
+        fh, mimetype, chunksize=chunk_size if resumable else -1, resumable=resumable
+    )
+
+
+def media_from_bytes(
+    data: bytes,
+    mimetype: str,
+    threshold: int = MULTIPART_THRESHOLD,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> MediaIoBaseUpload:
+    """Media body for content already in memory."""
+    return _media(io.BytesIO(data), mimetype, len(data), threshold, chunk_size)
+
+
+def media_from_path(
+    path: str,
+    mimetype: str,
+    threshold: int = MULTIPART_THRESHOLD,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> MediaFileUpload:
+    """Media body reading ``path`` chunk by chunk."""
+    resumable = os.path.getsize(path) > threshold
+    return MediaFileUpload(
+        path,
+        mimetype,
+        chunksize=chunk_size if resumable else -1,
+        resumable=resumable,
+    )
+
+
+def media_from_chunks(
+    chunks: Iterable[bytes],
+    mimetype: str,
+    threshold: int = MULTIPART_THRESHOLD,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> MediaIoBaseUpload:
+    """Media body for content produced by a generator.
+
+    Drive needs the total size up front, so the chunks are spooled first: in
+    memory up to ``threshold`` bytes, in a temporary file beyond that.
+    """
+    spool = SpooledTemporaryFile(max_size=threshold)
+    for chunk in chunks:
+        spool.write(chunk)
+    size = spool.tell()
+    spool.seek(0)
+    return _media(spool, mimetype, size, threshold, chunk_size)
+
+
+def upload_key(path: str) -> str:
+    """Session key of a file: changes whenever the file does."""
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class UploadSessions:
+    """Resumable session URIs of unfinished uploads, kept in a JSON file.
+
+    Drive keeps a session open for about a week, so an upload cut off by a
+    crash can be continued by the next run instead of starting over.
+    """
+
+    def __init__(self, path: str = "drive_uploads.json"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._sessions: dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._sessions = json.load(f)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._sessions.get(key)
+
+    def set(self, key: str, uri: Optional[str]) -> None:
+        with self._lock:
+            if uri is None:
+                if self._sessions.pop(key, None) is None:
+                    return
+            elif self._sessions.get(key) == uri:
+                return
+            else:
+                self._sessions[key] = uri
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._sessions, f)
+            os.replace(tmp, self.path)
+
+
+def _resume(request, uri: str):
+    """Point ``request`` at an existing session, from the offset Drive has.
+
+    Returns the file resource if the upload had in fact completed, else None.
+    An expired session leaves the request to start a new one.
+    """
+    headers = {
+        "Content-Range": f"bytes */{request.resumable.size()}",
+        "content-length": "0",
+    }
+    resp, content = request.http.request(uri, "PUT", headers=headers)
+    if resp.status in (200, 201):
+        return request.postproc(resp, content)
+    if resp.status in EXPIRED_STATUSES:
+        return None
+    if resp.status != 308:
+        raise HttpError(resp, content, uri=uri)
+    request.resumable_uri = uri
+    # "bytes=0-<last byte received>", absent if nothing was received
+    received = resp.get("range")
+    request.resumable_progress = int(received.split("-")[1]) + 1 if received else 0
+    return None
+
+
+def execute_upload(
+    request,
+    key: Optional[str] = None,
+    sessions: Optional[UploadSessions] = None,
+    num_retries: int = 3,
+    max_attempts: int = 5,
+    rate_limit_key: Optional[str] = "google_drive",
+    on_progress: Optional[Callable[[int, int], None]] = None,
+):
+    """Run a create/update request and return the resulting file resource.
+
+    Multipart requests are sent as they are. Resumable ones are sent chunk by
+    chunk; after a retryable error (429, 5xx or a dropped connection) the
+    server is asked how much it received and the upload continues from there.
+    Callers that retry themselves (e.g. under ``rate_limited``) pass
+    ``num_retries=0, max_attempts=1``, so a failure is retried in one layer.
+
+    Args:
+        request: A ``files().create`` or ``files().update`` request.
+        key: Identifies the content, for resuming across runs.
+        sessions: Where to keep the session URI while the upload is running.
+        num_retries: Retries of each chunk inside the client library.
+        max_attempts: Attempts of each chunk after the library gave up.
+        rate_limit_key: Limiter budget every chunk request is charged to.
+        on_progress: Called with ``(bytes sent, total bytes)`` after each chunk.
+    """
+    if getattr(request, "resumable", None) is None:
+        return request.execute(num_retries=num_retries)
+
+    resume_uri = None
+    if sessions is not None and key is not None:
+        resume_uri = sessions.get(key)
+
+    attempt = 0
+    first = True
+    while True:
+        if not first and rate_limit_key is not None:
+            limiter.acquire(rate_limit_key)
+        first = False
+        try:
+            if resume_uri is not None:
+                response = _resume(request, resume_uri)
+                resume_uri = None
+                if response is not None:
+                    sessions.set(key, None)
+                    return response
+                continue
+            # After an error next_chunk first asks the server for the
+            # committed offset, and continues from there
+            status, response = request.next_chunk(num_retries=num_retries)
+        except (HttpError, OSError) as e:
+            if isinstance(e, HttpError) and e.resp.status in EXPIRED_STATUSES:
+                # Session expired or unknown: start the upload over
+                request.resumable_uri = None
+                request.resumable_progress = 0
+                delay = 0.0
+            elif isinstance(e, HttpError):
+                delay = retry_delay(rate_limit_key, e, attempt)
+            else:
+                # Connection dropped mid-chunk
+                delay = backoff_delay(attempt)
+            attempt += 1
+            if delay is None or attempt >= max_attempts:
+                raise
+            time.sleep(delay)
+            continue
+
+        attempt = 0
+        if sessions is not None and key is not None:
+            sessions.set(key, None if response is not None else request.resumable_uri)
+        if response is not None:
+            return response
+        if on_progress is not None:
+            on_progress(status.resumable_progress, status.total_size)
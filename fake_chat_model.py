@@ -0,0 +1,101 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic offline chat model with configurable latency.
+
+    Every reply is ``output_tokens`` words long. The first token arrives after
+    ``latency`` seconds and each following one after ``token_latency``
+    seconds, both when invoking and when streaming.
+
+    Args:
+        latency: Seconds until the first token (time to first token).
+        token_latency: Seconds between two tokens.
+        output_tokens: Number of tokens in every reply.
+        model_name: Reported model name.
+    """
+
+    latency: float = 0.0
+    token_latency: float = 0.0
+    output_tokens: int = 20
+    model_name: str = "fake-chat-model"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {
+            "model_name": self.model_name,
+            "latency": self.latency,
+            "output_tokens": self.output_tokens,
+        }
+
+    def _tokens(self, messages: list[BaseMessage]) -> list[str]:
+        seed = len(messages)
+        return [f"tok{(seed + i) % 97} " for i in range(self.output_tokens)]
+
+    def _total_delay(self) -> float:
+        return self.latency + self.token_latency * max(self.output_tokens - 1, 0)
+
+    def _result(self, messages: list[BaseMessage]) -> ChatResult:
+        message = AIMessage(
+            "".join(self._tokens(messages)),
+            response_metadata={"model_name": self.model_name},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self._total_delay())
+        return self._result(messages)
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self._total_delay())
+        return self._result(messages)
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        for i, token in enumerate(self._tokens(messages)):
+            time.sleep(self.latency if i == 0 else self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        for i, token in enumerate(self._tokens(messages)):
+            await asyncio.sleep(self.latency if i == 0 else self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
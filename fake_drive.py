@@ -0,0 +1,319 @@
+"""In-memory stand-in for the Google Drive v3 service.
+
+Mimics the subset of ``build('drive', 'v3')`` used by the Drive tools:
+``files()`` and ``changes()`` return resources whose methods return request
+objects with an ``execute()`` method. Useful for running the tools and the
+metadata index offline.
+"""
+
+import itertools
+import re
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")[:-4] + "Z"
+
+
+def _unquote(value: str) -> str:
+    return value[1:-1].replace("\\'", "'").replace("\\\\", "\\")
+
+
+_CLAUSE = re.compile(
+    r"\s*(?:(?P<field>\w+)\s*(?P<op>contains|=|!=|>=|<=|>|<)\s*(?P<value>'(?:[^'\\]|\\.)*'|true|false)"
+    r"|(?P<parent>'(?:[^'\\]|\\.)*')\s+in\s+parents)\s*"
+)
+
+
+def _matches(query: Optional[str], f: dict) -> bool:
+    """Evaluate a Drive query made of clauses joined by ``and``."""
+    if not query:
+        return True
+    pos = 0
+    while pos < len(query):
+        m = _CLAUSE.match(query, pos)
+        if m is None:
+            raise ValueError(f"Unsupported query: {query!r}")
+        if m.group("parent"):
+            if _unquote(m.group("parent")) not in f.get("parents", []):
+                return False
+        else:
+            field, op, raw = m.group("field", "op", "value")
+            value = raw == "true" if raw in ("true", "false") else _unquote(raw)
+            actual = f.get(field)
+            if op == "contains":
+                if value.lower() not in str(actual).lower():
+                    return False
+            elif not {
+                "=": actual == value,
+                "!=": actual != value,
+                ">": actual is not None and actual > value,
+                "<": actual is not None and actual < value,
+                ">=": actual is not None and actual >= value,
+                "<=": actual is not None and actual <= value,
+            }[op]:
+                return False
+        pos = m.end()
+        if query.startswith("and", pos):
+            pos += 3
+    return True
+
+
+class FakeRequest:
+    """API request; every ``execute`` counts as one round trip."""
+
+    def __init__(self, service: "FakeDriveService", func):
+        self.service = service
+        self.func = func
+
+    def execute(self, num_retries: int = 0):
+        self.service.calls += 1
+        return self.func()
+
+
+class FakeBatch:
+    """Batch request running all added requests in a single round trip."""
+
+    def __init__(self, service: "FakeDriveService", callback=None):
+        self.service = service
+        self.callback = callback
+        self.requests: list[tuple[str, FakeRequest, object]] = []
+
+    def add(self, request: FakeRequest, callback=None, request_id=None) -> None:
+        request_id = request_id or str(len(self.requests) + 1)
+        self.requests.append((request_id, request, callback or self.callback))
+
+    def execute(self, http=None) -> None:
+        self.service.calls += 1
+        for request_id, request, callback in self.requests:
+            try:
+                response, exception = request.func(), None
+            except Exception as e:
+                response, exception = None, e
+            callback(request_id, response, exception)
+
+
+class FakeResponse(dict):
+    """httplib2-style response: a header dict with a ``status`` attribute."""
+
+    def __init__(self, status: int, headers: Optional[dict] = None):
+        super().__init__(headers or {})
+        self.status = status
+
+
+class FakeHttp:
+    """Serves ranged GETs of in-memory content like the Drive media endpoint."""
+
+    def __init__(
+        self,
+        service: "FakeDriveService",
+        content: bytes,
+        honour_range: bool = True,
+    ):
+        self.service = service
+        self.content = content
+        self.honour_range = honour_range
+        self.requests = 0
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        self.requests += 1
+        self.service.calls += 1
+        size = len(self.content)
+        range_ = (headers or {}).get("range")
+        if not range_ or not self.honour_range:
+            return FakeResponse(200, {"content-length": str(size)}), self.content
+        start, end = (int(x) for x in range_.split("=")[1].split("-"))
+        if start >= size:
+            return FakeResponse(416, {"content-range": f"bytes */{size}"}), b""
+        body = self.content[start : end + 1]
+        headers = {"content-range": f"bytes {start}-{start + len(body) - 1}/{size}"}
+        return FakeResponse(206, headers), body
+
+
+class FakeMediaRequest:
+    def __init__(self, uri: str, http: FakeHttp):
+        self.uri = uri
+        self.http = http
+        self.headers: dict = {}
+
+    def execute(self):
+        return self.http.content
+
+
+class FakeDriveService:
+    """Fake Drive service keeping files and their contents in memory."""
+
+    def __init__(self):
+        self.files_by_id: dict[str, dict] = {}
+        self.contents: dict[str, bytes] = {}
+        self.change_log: list[tuple[str, bool]] = []
+        self.calls = 0
+        self._ids = itertools.count(1)
+
+    # Test helpers
+    def add_file(
+        self,
+        name: str,
+        content: bytes = b"",
+        mime_type: str = "text/plain",
+        parents: Optional[list] = None,
+        modified_time: Optional[str] = None,
+    ) -> dict:
+        file_id = f"file{next(self._ids)}"
+        f = {
+            "id": file_id,
+            "name": name,
+            "mimeType": mime_type,
+            "modifiedTime": modified_time or _now(),
+            "size": str(len(content)),
+            "parents": parents or ["root"],
+            "trashed": False,
+        }
+        self.files_by_id[file_id] = f
+        self.contents[file_id] = content
+        self.change_log.append((file_id, False))
+        return f
+
+    def remove_file(self, file_id: str) -> None:
+        del self.files_by_id[file_id]
+        self.contents.pop(file_id, None)
+        self.change_log.append((file_id, True))
+
+    def new_batch_http_request(self, callback=None) -> FakeBatch:
+        return FakeBatch(self, callback)
+
+    def files(self) -> "FakeFiles":
+        return FakeFiles(self)
+
+    def changes(self) -> "FakeChanges":
+        return FakeChanges(self)
+
+
+class FakeFiles:
+    def __init__(self, service: FakeDriveService):
+        self.service = service
+
+    def _call(self, func) -> FakeRequest:
+        return FakeRequest(self.service, func)
+
+    def _write(self, file_id: str, body: Optional[dict], media_body) -> None:
+        f = self.service.files_by_id[file_id]
+        f.update(body or {})
+        if media_body is not None:
+            content = media_body.getbytes(0, media_body.size())
+            self.service.contents[file_id] = content
+            f["size"] = str(len(content))
+        f["modifiedTime"] = _now()
+        self.service.change_log.append((file_id, False))
+
+    def create(
+        self, body: Optional[dict] = None, media_body=None, fields=None, **kwargs
+    ) -> FakeRequest:
+        def run():
+            body_ = dict(body or {})
+            f = self.service.add_file(
+                body_.pop("name", "Untitled"),
+                mime_type=body_.pop("mimeType", "text/plain"),
+                parents=body_.pop("parents", None),
+            )
+            self._write(f["id"], body_, media_body)
+            f["webViewLink"] = f"https://drive.google.com/file/d/{f['id']}/view"
+            return dict(f)
+
+        return self._call(run)
+
+    def update(
+        self,
+        fileId: str,
+        body: Optional[dict] = None,
+        media_body=None,
+        fields=None,
+        **kwargs,
+    ) -> FakeRequest:
+        def run():
+            self._write(fileId, body, media_body)
+            return dict(self.service.files_by_id[fileId])
+
+        return self._call(run)
+
+    def list(
+        self,
+        q: Optional[str] = None,
+        pageSize: int = 100,
+        pageToken: Optional[str] = None,
+        fields: Optional[str] = None,
+        orderBy: Optional[str] = None,
+        **kwargs,
+    ) -> FakeRequest:
+        def run():
+            files = [f for f in self.service.files_by_id.values() if _matches(q, f)]
+            if orderBy:
+                key, _, direction = orderBy.partition(" ")
+                files.sort(key=lambda f: f.get(key, ""), reverse=direction == "desc")
+            start = int(pageToken or 0)
+            page = files[start : start + pageSize]
+            result = {"files": [dict(f) for f in page]}
+            if start + pageSize < len(files):
+                result["nextPageToken"] = str(start + pageSize)
+            return result
+
+        return self._call(run)
+
+    def get(self, fileId: str, fields: Optional[str] = None, **kwargs) -> FakeRequest:
+        return self._call(lambda: dict(self.service.files_by_id[fileId]))
+
+    def get_media(self, fileId: str, **kwargs) -> FakeMediaRequest:
+        return FakeMediaRequest(
+            f"fake://files/{fileId}?alt=media",
+            FakeHttp(self.service, self.service.contents[fileId]),
+        )
+
+    def export_media(self, fileId: str, mimeType: str, **kwargs) -> FakeMediaRequest:
+        # Exports ignore range headers, like the real endpoint
+        return FakeMediaRequest(
+            f"fake://files/{fileId}/export",
+            FakeHttp(self.service, self.service.contents[fileId], honour_range=False),
+        )
+
+    def delete(self, fileId: str, **kwargs) -> FakeRequest:
+        def run():
+            self.service.remove_file(fileId)
+            return ""
+
+        return self._call(run)
+
+
+class FakeChanges:
+    def __init__(self, service: FakeDriveService):
+        self.service = service
+
+    def getStartPageToken(self, **kwargs) -> FakeRequest:
+        return FakeRequest(
+            self.service, lambda: {"startPageToken": str(len(self.service.change_log))}
+        )
+
+    def list(
+        self,
+        pageToken: str,
+        pageSize: int = 100,
+        fields: Optional[str] = None,
+        **kwargs,
+    ) -> FakeRequest:
+        def run():
+            start = int(pageToken)
+            log = self.service.change_log
+            changes = []
+            for file_id, removed in log[start : start + pageSize]:
+                change = {"fileId": file_id, "removed": removed}
+                if not removed and file_id in self.service.files_by_id:
+                    change["file"] = dict(self.service.files_by_id[file_id])
+                changes.append(change)
+            result = {"changes": changes}
+            if start + pageSize < len(log):
+                result["nextPageToken"] = str(start + pageSize)
+            else:
+                result["newStartPageToken"] = str(len(log))
+            return result
+
+        return FakeRequest(self.service, run)
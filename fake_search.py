@@ -0,0 +1,48 @@
+import asyncio
+import time
+from typing import Any
+
+from langchain_core.tools import BaseTool
+from pydantic import BaseModel, Field
+
+
+class FakeSearchInput(BaseModel):
+    query: str = Field(description="Search query to look up")
+
+
+class FakeSearchTool(BaseTool):
+    """Offline stand-in for ``TavilySearch`` with a configurable latency.
+
+    Returns results shaped like Tavily's and counts upstream calls, so
+    wrappers such as ``CachedSearchTool`` can be exercised without network.
+    """
+
+    name: str = "tavily_search"
+    description: str = "A search engine returning results for the query."
+    args_schema: type[BaseModel] = FakeSearchInput
+    latency: float = 0.1
+    calls: int = 0
+
+    def _results(self, query: str) -> dict[str, Any]:
+        return {
+            "query": query,
+            "results": [
+                {
+                    "title": f"Result for {query}",
+                    "url": "https://example.com/search",
+                    "content": f"Canned content about {query}.",
+                    "score": 1.0,
+                }
+            ],
+            "response_time": self.latency,
+        }
+
+    def _run(self, query: str, run_manager=None) -> dict[str, Any]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return self._results(query)
+
+    async def _arun(self, query: str, run_manager=None) -> dict[str, Any]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return self._results(query)
@@ -0,0 +1,407 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+# Upper bounds of the tokens/sec histogram buckets
+RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+# Checkpointer methods timed by ``Instrumentation.checkpointer``
+CHECKPOINT_METHODS = (
+    "get_tuple",
+    "put",
+    "put_writes",
+    "aget_tuple",
+    "aput",
+    "aput_writes",
+)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Thread-safe set of labelled histograms with Prometheus text export."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: dict[str, tuple[str, tuple, dict]] = {}
+
+    def histogram(self, name: str, help: str, buckets: tuple = LATENCY_BUCKETS):
+        with self._lock:
+            self._metrics.setdefault(name, (help, buckets, {}))
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            _, buckets, series = self._metrics[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def summary(self) -> dict[str, dict[str, dict]]:
+        """Count, sum and mean of every series, keyed by metric and labels."""
+        result = {}
+        with self._lock:
+            for name, (_, _, series) in self._metrics.items():
+                for key, h in series.items():
+                    label = ",".join(f"{k}={v}" for k, v in key)
+                    result.setdefault(name, {})[label] = {
+                        "count": h.count,
+                        "sum": h.sum,
+                        "mean": h.sum / h.count if h.count else 0.0,
+                    }
+        return result
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, (help, buckets, series) in sorted(self._metrics.items()):
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, h in sorted(series.items()):
+                    labels = "".join(f'{k}="{_escape(v)}",' for k, v in key)
+                    cumulative = 0
+                    for bound, count in zip((*buckets, "+Inf"), h.counts):
+                        cumulative += count
+                        lines.append(
+                            f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}'
+                        )
+                    labels = "{" + labels.rstrip(",") + "}" if key else ""
+                    lines.append(f"{name}_sum{labels} {h.sum}")
+                    lines.append(f"{name}_count{labels} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """Atomically replace ``path`` with the current metrics."""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Record graph node, tool and model timings into a ``MetricsRegistry``.
+
+    Nodes are the chain runs LangGraph tags with ``langgraph_node``. For chat
+    models it records the total call time, time to first token, the gap
+    between streamed tokens and output tokens per second (from streamed
+    tokens, or from the usage metadata when the call was not streamed).
+    """
+
+    # Take timestamps when the event happens, not when an executor gets to it
+    run_inline = True
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        # run_id -> (kind, label, start time)
+        self._runs: dict[UUID, tuple[str, str, float]] = {}
+        # run_id -> [first token time, last token time, token count]
+        self._tokens: dict[UUID, list] = {}
+
+    def _start(self, run_id: UUID, kind: str, label: str) -> None:
+        self._runs[run_id] = (kind, label, time.perf_counter())
+
+    def _end(self, run_id: UUID) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        kind, label, start = run
+        end = time.perf_counter()
+        if kind == "node":
+            self.registry.observe("graph_node_seconds", end - start, node=label)
+        elif kind == "tool":
+            self.registry.observe("tool_seconds", end - start, tool=label)
+        elif kind == "llm":
+            self.registry.observe("llm_seconds", end - start, model=label)
+            tokens = self._tokens.pop(run_id, None)
+            if tokens is not None:
+                first, _, count = tokens
+                self.registry.observe(
+                    "llm_time_to_first_token_seconds", first - start, model=label
+                )
+                if count > 1 and end > first:
+                    self.registry.observe(
+                        "llm_tokens_per_second",
+                        (count - 1) / (end - first),
+                        model=label,
+                    )
+
+    def _error(self, run_id: UUID) -> None:
+        self._runs.pop(run_id, None)
+        self._tokens.pop(run_id, None)
+
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any],
+        inputs: dict[str, Any],
+        *,
+        run_id: UUID,
+        metadata: Optional[dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        if node is not None and kwargs.get("name") == node:
+            self._start(run_id, "node", node)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._error(run_id)
+
+    def on_tool_start(
+        self,
+        serialized: dict[str, Any],
+        input_str: str,
+        *,
+        run_id: UUID,
+        **kwargs: Any,
+    ) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name", "unknown")
+        self._start(run_id, "tool", name)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._error(run_id)
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list,
+        *,
+        run_id: UUID,
+        metadata: Optional[dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start(run_id, "llm", (metadata or {}).get("ls_model_name", "unknown"))
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        now = time.perf_counter()
+        tokens = self._tokens.get(run_id)
+        if tokens is None:
+            self._tokens[run_id] = [now, now, 1]
+            return
+        run = self._runs.get(run_id)
+        if run is not None:
+            self.registry.observe(
+                "llm_inter_token_seconds", now - tokens[1], model=run[1]
+            )
+        tokens[1] = now
+        tokens[2] += 1
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.get(run_id)
+        if run is not None and run_id not in self._tokens:
+            # Not streamed: derive tokens/sec from the reported usage
+            elapsed = time.perf_counter() - run[2]
+            for generations in response.generations:
+                for generation in generations:
+                    usage = getattr(generation.message, "usage_metadata", None)
+                    if usage and elapsed > 0:
+                        self.registry.observe(
+                            "llm_tokens_per_second",
+                            usage["output_tokens"] / elapsed,
+                            model=run[1],
+                        )
+        self._end(run_id)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._error(run_id)
+
+
+class Instrumentation:
+    """Pluggable timing for graphs, model streams and checkpointers.
+
+    When disabled, ``callbacks()`` is empty and ``checkpointer()`` returns the
+    saver unchanged, so nothing is added to the hot path. Used as a context
+    manager it serves ``/metrics`` on ``port`` while open and writes the
+    Prometheus text file to ``path`` on exit.
+
+    Example:
+
+        with Instrumentation(path="metrics.prom") as metrics:
+            app = build_app(metrics.checkpointer(SQLiteSaver("chat.db")))
+            app.invoke(inputs, {"callbacks": metrics.callbacks(), ...})
+
+    Args:
+        path: File the metrics are written to.
+        port: Port of a local Prometheus-text HTTP endpoint.
+        enabled: Collect metrics; defaults to whether ``path`` or ``port`` is set.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        port: Optional[int] = None,
+        enabled: Optional[bool] = None,
+    ):
+        self.path = path
+        self.port = port
+        self.enabled = bool(path or port) if enabled is None else enabled
+        self.registry = MetricsRegistry()
+        self.handler = MetricsCallbackHandler(self.registry)
+        self._server: Optional[ThreadingHTTPServer] = None
+        for name, help in (
+            ("graph_node_seconds", "Wall time per graph node run."),
+            ("tool_seconds", "Wall time per tool call."),
+            ("llm_seconds", "Wall time per chat model call."),
+            ("llm_time_to_first_token_seconds", "Time to the first streamed token."),
+            ("llm_inter_token_seconds", "Time between two streamed tokens."),
+            ("checkpoint_seconds", "Wall time per checkpointer operation."),
+            ("span_seconds", "Wall time of code blocks timed with span()."),
+        ):
+            self.registry.histogram(name, help)
+        self.registry.histogram(
+            "llm_tokens_per_second", "Output tokens per second.", RATE_BUCKETS
+        )
+
+    @classmethod
+    def from_env(cls) -> "Instrumentation":
+        """Configure from ``METRICS_FILE`` and ``METRICS_PORT``."""
+        port = os.getenv("METRICS_PORT")
+        return cls(path=os.getenv("METRICS_FILE"), port=int(port) if port else None)
+
+    def callbacks(self) -> list[BaseCallbackHandler]:
+        return [self.handler] if self.enabled else []
+
+    def checkpointer(self, saver):
+        """Time the read and write methods of ``saver`` in place."""
+        if not self.enabled:
+            return saver
+        for method in CHECKPOINT_METHODS:
+            setattr(saver, method, self._timed(getattr(saver, method), method))
+        return saver
+
+    def _timed(self, method, operation: str):
+        observe = self.registry.observe
+        if method.__name__.startswith("a"):
+
+            @wraps(method)
+            async def timed_async(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await method(*args, **kwargs)
+                finally:
+                    observe(
+                        "checkpoint_seconds",
+                        time.perf_counter() - start,
+                        operation=operation,
+                    )
+
+            return timed_async
+
+        @wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                observe(
+                    "checkpoint_seconds",
+                    time.perf_counter() - start,
+                    operation=operation,
+                )
+
+        return timed
+
+    @contextmanager
+    def span(self, name: str):
+        """Time a block of code, e.g. prompt rendering outside a graph."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registry.observe(
+                "span_seconds", time.perf_counter() - start, span=name
+            )
+
+    def export(self) -> None:
+        if self.enabled and self.path:
+            self.registry.write(self.path)
+
+    def serve(self, port: int) -> None:
+        """Serve the metrics in Prometheus text format on localhost."""
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.export()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def start(self) -> "Instrumentation":
+        """Start the HTTP endpoint if a port is configured."""
+        if self.enabled and self.port and self._server is None:
+            self.serve(self.port)
+        return self
+
+    def __enter__(self) -> "Instrumentation":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
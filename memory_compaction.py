@@ -0,0 +1,149 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Hashable, Optional, Sequence
+
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+)
+from langchain_core.messages.utils import count_tokens_approximately, get_buffer_string
+from langchain_core.runnables import RunnableConfig
+
+SUMMARY_PROMPT = (
+    "Condense the conversation below into a short summary that keeps every fact, "
+    "preference and open question needed to continue it. Extend the existing "
+    "summary if there is one."
+)
+
+
+def summary_messages(summary: str) -> list[BaseMessage]:
+    """Preamble carrying ``summary`` as a human/assistant exchange.
+
+    Goes between the system prompt and the history: no second system
+    message, which some providers reject, and the cached prefix is unchanged.
+    """
+    if not summary:
+        return []
+    return [
+        HumanMessage(f"Summary of our conversation so far: {summary}"),
+        AIMessage("Thanks, I will continue from that summary."),
+    ]
+
+
+class MessageCompactor:
+    """Fold old messages into a running summary off the critical path.
+
+    After a turn, ``schedule`` checks the history size and, once it exceeds
+    ``max_tokens``, summarizes the oldest messages in a background thread so
+    that roughly ``keep_tokens`` of recent history remains. The next turn picks
+    the finished summary up with ``collect``, which returns a state update
+    replacing the folded messages with the new summary; the user never waits
+    for summarization. The last human turn and what follows it are never
+    folded.
+
+    ``node`` does both as a graph node, to run before the model node of any
+    graph whose state has ``messages`` and ``summary``::
+
+        workflow.add_edge(START, "compact")
+        workflow.add_node("compact", compactor.node)
+        workflow.add_edge("compact", "model")
+
+    Args:
+        model: Chat model used to write summaries.
+        max_tokens: History size that triggers compaction.
+        keep_tokens: History size kept verbatim after compaction.
+        token_counter: Counts tokens of a list of messages.
+    """
+
+    def __init__(
+        self,
+        model,
+        max_tokens: int = 2000,
+        keep_tokens: int = 500,
+        token_counter: Callable[[list[BaseMessage]], int] = count_tokens_approximately,
+        max_workers: int = 2,
+    ):
+        self.model = model
+        self.max_tokens = max_tokens
+        self.keep_tokens = keep_tokens
+        self.token_counter = token_counter
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._jobs: dict[Hashable, Future] = {}
+
+    def _summarize(
+        self, messages: Sequence[BaseMessage], summary: str
+    ) -> tuple[str, list[str]]:
+        transcript = get_buffer_string(messages)
+        if summary:
+            transcript = f"Existing summary:\n{summary}\n\nNew messages:\n{transcript}"
+        response = self.model.invoke(
+            [SystemMessage(SUMMARY_PROMPT), HumanMessage(transcript)]
+        )
+        return response.content, [m.id for m in messages]
+
+    def schedule(
+        self, key: Hashable, messages: Sequence[BaseMessage], summary: str = ""
+    ) -> bool:
+        """Start compacting ``messages`` if they are over budget.
+
+        Returns True if a background summarization was started.
+        """
+        if key in self._jobs:
+            return False
+        counts = [self.token_counter([m]) for m in messages]
+        if sum(counts) <= self.max_tokens:
+            return False
+
+        # Keep the newest messages within keep_tokens, starting on a human turn
+        kept, split = 0, len(messages)
+        while split > 0 and kept + counts[split - 1] <= self.keep_tokens:
+            split -= 1
+            kept += counts[split]
+        while split < len(messages) and not isinstance(messages[split], HumanMessage):
+            split += 1
+        # Even if the newest messages alone are over keep_tokens
+        humans = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+        split = min(split, humans[-1]) if humans else 0
+        if split == 0:
+            return False
+
+        self._jobs[key] = self._executor.submit(
+            self._summarize, list(messages[:split]), summary
+        )
+        return True
+
+    def collect(self, key: Hashable) -> Optional[dict]:
+        """Return the state update of a finished compaction, if any."""
+        job = self._jobs.get(key)
+        if job is None or not job.done():
+            return None
+        del self._jobs[key]
+        if job.exception() is not None:
+            return None
+        summary, folded_ids = job.result()
+        return {
+            "summary": summary,
+            "messages": [RemoveMessage(id=message_id) for message_id in folded_ids],
+        }
+
+    def node(self, state: dict, config: RunnableConfig) -> dict:
+        """Graph node: apply a finished summary, start compacting if needed.
+
+        Summarization runs while the rest of the turn does and its result is
+        applied on the next turn. Conversations are told apart by thread id.
+        """
+        key = config["configurable"]["thread_id"]
+        messages = state["messages"]
+        summary = state.get("summary", "")
+        update = self.collect(key)
+        if update is not None:
+            folded = {m.id for m in update["messages"]}
+            messages = [m for m in messages if m.id not in folded]
+            summary = update["summary"]
+        self.schedule(key, messages, summary)
+        return update or {}
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
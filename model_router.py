@@ -0,0 +1,446 @@
+import asyncio
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, AsyncIterator, Hashable, Iterator, Optional, Sequence
+
+from langchain.chat_models import init_chat_model
+from langchain_core.callbacks import AsyncCallbackManager, CallbackManager
+from langchain_core.callbacks.manager import AsyncRunManager
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+from langgraph.constants import TAG_NOSTREAM
+from pydantic import Field
+
+from rate_limits import model_rate_limits
+
+# Threads running sync backend calls and streams for every router
+_executor = ContextThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+
+# Marks the end of a stream pumped through a queue
+_DONE = object()
+
+
+class LatencyTracker:
+    """Rolling window of latencies per key, with quantiles."""
+
+    def __init__(self, window: int = 200):
+        self._samples: dict[Hashable, deque] = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, key: Hashable, seconds: float) -> None:
+        with self._lock:
+            self._samples[key].append(seconds)
+
+    def count(self, key: Hashable) -> int:
+        with self._lock:
+            return len(self._samples.get(key, ()))
+
+    def quantile(self, key: Hashable, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if not samples:
+            return None
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+class HedgedChatModel(BaseChatModel):
+    """Chat model routing each call across a pool of backends, with hedging.
+
+    Calls go to the backend with the lowest rolling median latency. If it has
+    not answered once its own p95 (``hedge_quantile``) has passed, the same
+    request is also sent to the next fastest backend and the first response
+    wins; the other call is cancelled (async) or discarded (sync, where a
+    running thread cannot be interrupted). Streams race on the first chunk,
+    measured against the time-to-first-token p95, and the losing stream is
+    closed. Only calls that complete are measured; a lost race leaves no
+    sample. A backend that fails is charged ``error_penalty`` seconds and the
+    request fails over to the next one.
+
+    Until a backend has ``min_samples`` latencies it is tried first, so every
+    backend gets measured, and hedging waits ``default_hedge_delay`` for it.
+
+    Example:
+
+        model = HedgedChatModel(
+            backends=[
+                init_chat_model("openai:gpt-4o-mini"),
+                init_chat_model("anthropic:claude-3-5-haiku-latest"),
+            ]
+        )
+
+    Args:
+        backends: Chat models (or models with bound tools) to route between.
+        hedge_quantile: Latency quantile after which a hedge is sent.
+        max_hedges: Extra backends one call may be sent to.
+        min_samples: Latencies needed before a backend's quantiles are used.
+        default_hedge_delay: Hedge delay for a backend without enough samples.
+        error_penalty: Latency recorded for a failed call.
+        tracker: Latency history, shared with copies made by ``bind_tools``.
+    """
+
+    backends: list[Runnable]
+    hedge_quantile: float = 0.95
+    max_hedges: int = 1
+    min_samples: int = 20
+    default_hedge_delay: float = 5.0
+    error_penalty: float = 30.0
+    tracker: LatencyTracker = Field(default_factory=LatencyTracker, exclude=True)
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedged-chat"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {
+            "backends": [_backend_name(b) for b in self.backends],
+            "hedge_quantile": self.hedge_quantile,
+        }
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "HedgedChatModel":
+        return self.model_copy(
+            update={"backends": [b.bind_tools(tools, **kwargs) for b in self.backends]}
+        )
+
+    def stats(self) -> list[dict[str, Any]]:
+        """Rolling latency figures per backend."""
+        return [
+            {
+                "backend": _backend_name(backend),
+                "samples": self.tracker.count(i),
+                "p50": self.tracker.quantile(i, 0.5),
+                "p95": self.tracker.quantile(i, self.hedge_quantile),
+                "ttft_p95": self.tracker.quantile((i, "ttft"), self.hedge_quantile),
+            }
+            for i, backend in enumerate(self.backends)
+        ]
+
+    def _order(self, kind: Optional[str] = None) -> list[int]:
+        def rank(i: int) -> float:
+            key = i if kind is None else (i, kind)
+            if self.tracker.count(key) < self.min_samples:
+                return 0.0
+            return self.tracker.quantile(key, 0.5)
+
+        return sorted(range(len(self.backends)), key=rank)
+
+    def _hedge_delay(self, i: int, kind: Optional[str] = None) -> float:
+        key = i if kind is None else (i, kind)
+        if self.tracker.count(key) < self.min_samples:
+            return self.default_hedge_delay
+        return self.tracker.quantile(key, self.hedge_quantile)
+
+    def _call_args(self, stop, run_manager, kwargs) -> tuple[dict, dict]:
+        # Backend runs are traced under this one, but their tokens must not be
+        # streamed by LangGraph next to the router's (a losing hedge included)
+        config = {"callbacks": _child_callbacks(run_manager)}
+        if stop is not None:
+            kwargs = {**kwargs, "stop": stop}
+        return config, kwargs
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        config, kwargs = self._call_args(stop, run_manager, kwargs)
+        waiting = self._order()
+        pending: dict[Future, tuple[int, float]] = {}
+        errors: list[BaseException] = []
+        hedges = 0
+
+        def launch() -> None:
+            i = waiting.pop(0)
+            future = _executor.submit(
+                self.backends[i].invoke, messages, config, **kwargs
+            )
+            pending[future] = (i, time.monotonic())
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if waiting and hedges < self.max_hedges:
+                    i, started = max(pending.values(), key=lambda p: p[1])
+                    timeout = max(started + self._hedge_delay(i) - time.monotonic(), 0)
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    hedges += 1
+                    launch()
+                    continue
+                for future in done:
+                    i, started = pending.pop(future)
+                    if future.exception() is None:
+                        self.tracker.record(i, time.monotonic() - started)
+                        return _result(future.result())
+                    self.tracker.record(i, self.error_penalty)
+                    errors.append(future.exception())
+                if not pending and waiting:
+                    launch()
+            raise errors[-1]
+        finally:
+            # Losers never finished, so they leave no latency sample
+            for future in pending:
+                future.cancel()
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        config, kwargs = self._call_args(stop, run_manager, kwargs)
+        waiting = self._order()
+        pending: dict[asyncio.Task, tuple[int, float]] = {}
+        errors: list[BaseException] = []
+        hedges = 0
+
+        def launch() -> None:
+            i = waiting.pop(0)
+            task = asyncio.ensure_future(
+                self.backends[i].ainvoke(messages, config, **kwargs)
+            )
+            pending[task] = (i, time.monotonic())
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if waiting and hedges < self.max_hedges:
+                    i, started = max(pending.values(), key=lambda p: p[1])
+                    timeout = max(started + self._hedge_delay(i) - time.monotonic(), 0)
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedges += 1
+                    launch()
+                    continue
+                for task in done:
+                    i, started = pending.pop(task)
+                    if task.exception() is None:
+                        self.tracker.record(i, time.monotonic() - started)
+                        return _result(task.result())
+                    self.tracker.record(i, self.error_penalty)
+                    errors.append(task.exception())
+                if not pending and waiting:
+                    launch()
+            raise errors[-1]
+        finally:
+            # Losers never finished, so they leave no latency sample
+            for task in pending:
+                task.cancel()
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        config, kwargs = self._call_args(stop, run_manager, kwargs)
+        waiting = self._order("ttft")
+        chunks: queue.Queue = queue.Queue()
+        started: dict[int, float] = {}
+        stops: dict[int, threading.Event] = {}
+        errors: list[BaseException] = []
+        hedges = 0
+
+        def pump(i: int, stop_event: threading.Event) -> None:
+            try:
+                for chunk in self.backends[i].stream(messages, config, **kwargs):
+                    if stop_event.is_set():
+                        return
+                    chunks.put((i, chunk))
+                chunks.put((i, _DONE))
+            except BaseException as e:
+                chunks.put((i, e))
+
+        def launch() -> None:
+            i = waiting.pop(0)
+            started[i] = time.monotonic()
+            stops[i] = threading.Event()
+            _executor.submit(pump, i, stops[i])
+
+        launch()
+        winner = None
+        try:
+            while winner is None:
+                timeout = None
+                if waiting and hedges < self.max_hedges:
+                    last = max(started, key=started.get)
+                    deadline = started[last] + self._hedge_delay(last, "ttft")
+                    timeout = max(deadline - time.monotonic(), 0)
+                try:
+                    i, item = chunks.get(timeout=timeout)
+                except queue.Empty:
+                    hedges += 1
+                    launch()
+                    continue
+                if isinstance(item, BaseException) or item is _DONE:
+                    # Failed (or ended empty) before the first chunk
+                    self.tracker.record((i, "ttft"), self.error_penalty)
+                    if isinstance(item, BaseException):
+                        errors.append(item)
+                    del stops[i]
+                    if not stops:
+                        if not waiting:
+                            if errors:
+                                raise errors[-1]
+                            return
+                        launch()
+                    continue
+                winner = i
+                self.tracker.record((i, "ttft"), time.monotonic() - started[i])
+                for other, stop_event in stops.items():
+                    if other != winner:
+                        stop_event.set()
+                chunk = ChatGenerationChunk(message=item)
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+
+            while True:
+                i, item = chunks.get()
+                if i != winner:
+                    continue
+                if item is _DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                chunk = ChatGenerationChunk(message=item)
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+            self.tracker.record(winner, time.monotonic() - started[winner])
+        finally:
+            for stop_event in stops.values():
+                stop_event.set()
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        config, kwargs = self._call_args(stop, run_manager, kwargs)
+        waiting = self._order("ttft")
+        # First-chunk task -> (backend, start time, stream)
+        pending: dict[asyncio.Task, tuple[int, float, Any]] = {}
+        errors: list[BaseException] = []
+        hedges = 0
+
+        def launch() -> None:
+            i = waiting.pop(0)
+            stream = self.backends[i].astream(messages, config, **kwargs)
+            task = asyncio.ensure_future(anext(stream))
+            pending[task] = (i, time.monotonic(), stream)
+
+        launch()
+        winner = None
+        try:
+            while winner is None:
+                timeout = None
+                if waiting and hedges < self.max_hedges:
+                    i, started, _ = max(pending.values(), key=lambda p: p[1])
+                    deadline = started + self._hedge_delay(i, "ttft")
+                    timeout = max(deadline - time.monotonic(), 0)
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedges += 1
+                    launch()
+                    continue
+                for task in done:
+                    i, started, stream = pending.pop(task)
+                    if winner is None and task.exception() is None:
+                        winner = (i, started, stream, task.result())
+                        self.tracker.record((i, "ttft"), time.monotonic() - started)
+                        continue
+                    if task.exception() is not None:
+                        if not isinstance(task.exception(), StopAsyncIteration):
+                            errors.append(task.exception())
+                        self.tracker.record((i, "ttft"), self.error_penalty)
+                    await stream.aclose()
+                if winner is None and not pending:
+                    if not waiting:
+                        if errors:
+                            raise errors[-1]
+                        return
+                    launch()
+        finally:
+            for task, (i, started, stream) in pending.items():
+                task.cancel()
+                try:
+                    await task
+                except BaseException:
+                    pass
+                await stream.aclose()
+
+        i, started, stream, first = winner
+        async for item in _prepend(first, stream):
+            chunk = ChatGenerationChunk(message=item)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+        self.tracker.record(i, time.monotonic() - started)
+
+
+def _backend_name(backend: Runnable) -> str:
+    model = getattr(backend, "bound", backend)
+    return getattr(model, "model_name", None) or getattr(
+        model, "model", type(model).__name__
+    )
+
+
+def _child_callbacks(run_manager) -> Any:
+    """Callbacks for backend runs, nested under the router's run."""
+    if run_manager is None:
+        return []
+    if isinstance(run_manager, AsyncRunManager):
+        manager = AsyncCallbackManager(handlers=[], parent_run_id=run_manager.run_id)
+    else:
+        manager = CallbackManager(handlers=[], parent_run_id=run_manager.run_id)
+    manager.set_handlers(run_manager.inheritable_handlers)
+    manager.add_tags([*run_manager.inheritable_tags, TAG_NOSTREAM])
+    manager.add_metadata(run_manager.inheritable_metadata)
+    return manager
+
+
+def _result(message: BaseMessage) -> ChatResult:
+    return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+async def _prepend(first: Any, stream: AsyncIterator) -> AsyncIterator:
+    yield first
+    async for item in stream:
+        yield item
+
+
+def init_hedged_model(specs: str, **kwargs: Any) -> BaseChatModel:
+    """Build a model from comma-separated ``provider:model`` specs.
+
+    Every model draws on the shared rate limits of its provider. A single
+    spec returns the plain model; several return a
+    ``HedgedChatModel`` over them, e.g.
+    ``"openai:gpt-4o-mini, anthropic:claude-3-5-haiku-latest"``.
+    """
+    models = [
+        init_chat_model(spec, **model_rate_limits(spec.partition(":")[0]))
+        for spec in (s.strip() for s in specs.split(","))
+        if spec
+    ]
+    if len(models) == 1:
+        return models[0]
+    return HedgedChatModel(backends=models, **kwargs)
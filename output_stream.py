@@ -2,6 +2,7 @@
 from dotenv import load_dotenv
 from langchain.chat_models import init_chat_model
 from langchain_core.messages import HumanMessage, SystemMessage
+from instrumentation import Instrumentation
 
 load_dotenv()
 
@@ -41,10 +42,15 @@ def main():
         ),
     ]
 
+    # Time to first token and tokens/sec, when METRICS_FILE or METRICS_PORT is set
+    metrics = Instrumentation.from_env().start()
+
     # Stream output
-    for token in model.stream(messages):
+    for token in model.stream(messages, {"callbacks": metrics.callbacks()}):
         print(token.content, end="")
 
+    metrics.close()
+
 
 if __name__ == "__main__":
     main()
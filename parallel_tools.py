@@ -0,0 +1,144 @@
+import asyncio
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import Future
+from functools import partial
+from typing import Any, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import ContextThreadPoolExecutor, get_config_list
+from langchain_core.tools import BaseTool, StructuredTool
+from langgraph.prebuilt import ToolNode
+from langgraph.store.base import BaseStore
+
+# ToolNode has no public per-call API: these are the hooks its own _func and
+# _afunc are built from. Fail on import rather than mid-run if they change.
+_TOOL_NODE_HOOKS = ("_parse_input", "_run_one", "_arun_one", "_combine_tool_outputs")
+_missing = [name for name in _TOOL_NODE_HOOKS if not hasattr(ToolNode, name)]
+if _missing:
+    raise ImportError(
+        f"ParallelToolNode needs ToolNode.{', '.join(_missing)}; "
+        "this langgraph-prebuilt version is not supported"
+    )
+
+
+def _is_async_native(tool: BaseTool) -> bool:
+    if isinstance(tool, StructuredTool):
+        return tool.coroutine is not None
+    return type(tool)._arun is not BaseTool._arun
+
+
+def _copy_result(source: Future, target: Future) -> None:
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+class ParallelToolNode(ToolNode):
+    """``ToolNode`` that runs the tool calls of one step concurrently.
+
+    Sync tools run on a shared, bounded thread pool (instead of a new pool per
+    step) and async-native tools run as coroutines on the event loop. Each tool
+    can be given its own concurrency limit, e.g. to stay under an API's rate
+    limit. Tool messages are returned in tool-call order, so a step takes as
+    long as its slowest call rather than the sum of all of them.
+
+    Args:
+        tools: Tools available to the agent.
+        max_workers: Size of the thread pool for sync tools.
+        tool_concurrency: Maximum concurrent calls per tool name.
+        **kwargs: Passed on to ``ToolNode``.
+    """
+
+    def __init__(
+        self,
+        tools: Sequence[Any],
+        *,
+        max_workers: int = 8,
+        tool_concurrency: Optional[dict[str, int]] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(tools, **kwargs)
+        self.executor = ContextThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="tool"
+        )
+        self.tool_concurrency = tool_concurrency or {}
+        self._lock = threading.Lock()
+        self._running: dict[str, int] = defaultdict(int)
+        self._waiting: dict[str, deque] = defaultdict(deque)
+        self._async_limits: dict[str, asyncio.Semaphore] = {}
+
+    def _submit(self, call, input_type, config) -> Future:
+        """Run a call on the pool, once its tool is under its concurrency limit.
+
+        Calls over the limit wait in a queue, not in a pool thread, and are
+        submitted as earlier calls of the same tool finish.
+        """
+        name = call["name"]
+        if name not in self.tool_concurrency:
+            return self.executor.submit(self._run_one, call, input_type, config)
+        future: Future = Future()
+        with self._lock:
+            self._waiting[name].append((future, call, input_type, config))
+        self._dispatch(name)
+        return future
+
+    def _dispatch(self, name: str) -> None:
+        while True:
+            with self._lock:
+                if (
+                    not self._waiting[name]
+                    or self._running[name] >= self.tool_concurrency[name]
+                ):
+                    return
+                future, call, input_type, config = self._waiting[name].popleft()
+                self._running[name] += 1
+            running = self.executor.submit(self._run_one, call, input_type, config)
+            running.add_done_callback(partial(self._finished, name, future))
+
+    def _finished(self, name: str, future: Future, running: Future) -> None:
+        with self._lock:
+            self._running[name] -= 1
+        _copy_result(running, future)
+        self._dispatch(name)
+
+    async def _arun_limited(self, call, input_type, config):
+        tool = self.tools_by_name.get(call["name"])
+        if tool is not None and not _is_async_native(tool):
+            # Blocking tool: run it on the bounded pool instead of the loop
+            return await asyncio.wrap_future(self._submit(call, input_type, config))
+        limit = None
+        if call["name"] in self.tool_concurrency:
+            limit = self._async_limits.setdefault(
+                call["name"], asyncio.Semaphore(self.tool_concurrency[call["name"]])
+            )
+        if limit is None:
+            return await self._arun_one(call, input_type, config)
+        async with limit:
+            return await self._arun_one(call, input_type, config)
+
+    def _func(
+        self, input, config: RunnableConfig, *, store: Optional[BaseStore]
+    ) -> Any:
+        tool_calls, input_type = self._parse_input(input, store)
+        config_list = get_config_list(config, len(tool_calls))
+        futures = [
+            self._submit(call, input_type, call_config)
+            for call, call_config in zip(tool_calls, config_list)
+        ]
+        outputs = [future.result() for future in futures]
+        return self._combine_tool_outputs(outputs, input_type)
+
+    async def _afunc(
+        self, input, config: RunnableConfig, *, store: Optional[BaseStore]
+    ) -> Any:
+        tool_calls, input_type = self._parse_input(input, store)
+        config_list = get_config_list(config, len(tool_calls))
+        outputs = await asyncio.gather(
+            *(
+                self._arun_limited(call, input_type, call_config)
+                for call, call_config in zip(tool_calls, config_list)
+            )
+        )
+        return self._combine_tool_outputs(outputs, input_type)
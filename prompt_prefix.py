@@ -0,0 +1,116 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Sequence
+
+from langchain_core.messages import BaseMessage, convert_to_openai_messages
+from langchain_core.prompts import ChatPromptTemplate
+
+try:
+    from langchain_anthropic import ChatAnthropic
+except ImportError:  # Anthropic support not installed
+    ChatAnthropic = None
+
+# Anthropic marker: cache the request up to and including this content block
+EPHEMERAL = {"type": "ephemeral"}
+
+
+def supports_cache_control(model) -> bool:
+    """Whether ``model`` takes explicit prompt-cache markers (Anthropic)."""
+    return ChatAnthropic is not None and isinstance(model, ChatAnthropic)
+
+
+class PrefixCachedPrompt:
+    """Render the system prefix of a prompt once per set of variables.
+
+    The prefix template (typically the system message) is rendered on first
+    use for each combination of variables and the same messages are reused on
+    later turns, so every request of a conversation starts with a
+    byte-identical prefix. That is what provider-side prompt caching keys on:
+    OpenAI caches such prefixes automatically, and with ``cache_control`` the
+    last prefix message also carries an Anthropic ``cache_control`` marker.
+
+    The rendered messages are shared between calls and must not be modified.
+
+    Example:
+
+        system_prompt = PrefixCachedPrompt(
+            ChatPromptTemplate.from_messages([("system", "Answer in {language}.")])
+        )
+        prompt = system_prompt.render(state["messages"], language="English")
+
+    Args:
+        template: Template of the stable part of the prompt.
+        cache_control: Mark the end of the prefix for Anthropic prompt caching.
+        maxsize: Number of rendered variable sets to keep.
+    """
+
+    def __init__(
+        self,
+        template: ChatPromptTemplate,
+        cache_control: bool = False,
+        maxsize: int = 128,
+    ):
+        self.template = template
+        self.cache_control = cache_control
+        self.maxsize = maxsize
+        self._rendered: OrderedDict[tuple, tuple[BaseMessage, ...]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def prefix(self, **variables: Any) -> tuple[BaseMessage, ...]:
+        """Return the rendered prefix messages for ``variables``."""
+        key = tuple(sorted(variables.items()))
+        with self._lock:
+            rendered = self._rendered.get(key)
+            if rendered is not None:
+                self._rendered.move_to_end(key)
+                return rendered
+        rendered = tuple(self.template.format_messages(**variables))
+        if self.cache_control and rendered:
+            rendered = (*rendered[:-1], _with_cache_control(rendered[-1]))
+        with self._lock:
+            self._rendered[key] = rendered
+            while len(self._rendered) > self.maxsize:
+                self._rendered.popitem(last=False)
+        return rendered
+
+    def render(
+        self, messages: Sequence[BaseMessage], **variables: Any
+    ) -> list[BaseMessage]:
+        """Return the cached prefix followed by ``messages``."""
+        return [*self.prefix(**variables), *messages]
+
+
+def _with_cache_control(message: BaseMessage) -> BaseMessage:
+    content = message.content
+    if isinstance(content, str):
+        blocks = [{"type": "text", "text": content}]
+    else:
+        blocks = [
+            block if isinstance(block, dict) else {"type": "text", "text": block}
+            for block in content
+        ]
+    blocks[-1] = {**blocks[-1], "cache_control": EPHEMERAL}
+    return message.model_copy(update={"content": blocks})
+
+
+def shared_prefix(a: Sequence[BaseMessage], b: Sequence[BaseMessage]) -> int:
+    """Number of leading messages two prompts send identically.
+
+    Checks offline that consecutive renders keep a cacheable prefix: the
+    messages are compared in OpenAI wire format, cache markers included.
+
+        first = system_prompt.render(history, language="English")
+        second = system_prompt.render([*history, reply, question], language="English")
+        assert shared_prefix(first, second) == len(first)
+    """
+    count = 0
+    for x, y in zip(convert_to_openai_messages(a), convert_to_openai_messages(b)):
+        if _dump(x) != _dump(y):
+            break
+        count += 1
+    return count
+
+
+def _dump(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, default=str)
@@ -2,12 +2,51 @@
 from dotenv import load_dotenv
 from langchain.chat_models import init_chat_model
 from langchain.prompts import ChatPromptTemplate
+from response_cache import LRUSQLiteCache
+from rate_limits import BATCH, model_rate_limits, priority
 
 load_dotenv()
+response_cache = LRUSQLiteCache(maxsize=256, ttl=7 * 24 * 3600)
+
+
+def translate_batch(model, prompt_template, text, languages, max_concurrency=8):
+    """Translate text into every language in one batched call.
+
+    Results come back in the order of ``languages``; a failed item is returned
+    as its exception instead of aborting the whole batch. The calls queue
+    behind interactive ones for the shared rate limits.
+    """
+    prompts = [
+        prompt_template.invoke({"language": lang, "text": text}) for lang in languages
+    ]
+    with priority(BATCH):
+        return model.batch(
+            prompts,
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
+        )
+
+
+async def atranslate_batch(model, prompt_template, text, languages, max_concurrency=8):
+    """Async version of ``translate_batch``."""
+    prompts = [
+        prompt_template.invoke({"language": lang, "text": text}) for lang in languages
+    ]
+    with priority(BATCH):
+        return await model.abatch(
+            prompts,
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
+        )
 
 
 def main():
-    model = init_chat_model("gpt-4o-mini", model_provider="openai")
+    model = init_chat_model(
+        "gpt-4o-mini",
+        model_provider="openai",
+        cache=response_cache,
+        **model_rate_limits("openai"),
+    )
 
     system_template = "Translate the following from Polish into {language}"
 
@@ -17,12 +56,14 @@ def main():
 
     lang_lst = ["Italian", "Japan", "German"]
 
-    for lang in lang_lst:
-        prompt = prompt_template.invoke(
-            {"language": lang, "text": "Cze! Jak si masz?"}
-        )
-        response = model.invoke(prompt)
-        print(response.content)
+    responses = translate_batch(
+        model, prompt_template, "Cze! Jak si masz?", lang_lst
+    )
+    for lang, response in zip(lang_lst, responses):
+        if isinstance(response, Exception):
+            print(f"{lang}: translation failed ({response})")
+        else:
+            print(response.content)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,509 @@
+import asyncio
+import functools
+import heapq
+import inspect
+import itertools
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.rate_limiters import BaseRateLimiter
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import patch_config
+from langchain_core.tools import BaseTool
+
+# Lower values go first
+INTERACTIVE = 0
+BATCH = 10
+
+# (requests per minute, tokens per minute) per provider or tool; None = no limit
+DEFAULT_LIMITS = {
+    "openai": (500, 200_000),
+    "anthropic": (50, 40_000),
+    "tavily": (100, None),
+    "google_drive": (600, None),
+}
+
+# HTTP statuses worth retrying after a backoff
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Retries of a model call, made by the provider SDK
+MODEL_MAX_RETRIES = 4
+
+_priority: ContextVar[int] = ContextVar("rate_limit_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level: int):
+    """Queue the calls made in this block (and its threads/tasks) at ``level``."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """Bucket refilled continuously at ``per_minute`` units a minute.
+
+    The level may go negative when usage is charged after the fact; callers
+    then wait until it has refilled.
+    """
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60
+        self.capacity = burst or per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost: float, now: float) -> float:
+        self._refill(now)
+        cost = min(cost, self.capacity)
+        return max((cost - self.level) / self.rate, 0.0)
+
+    def charge(self, cost: float) -> None:
+        self.level -= cost
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    wake: Optional[Callable[[], None]] = field(default=None, compare=False)
+
+
+class _Limit:
+    def __init__(self, requests_per_minute, tokens_per_minute, burst):
+        self.requests = (
+            TokenBucket(requests_per_minute, burst) if requests_per_minute else None
+        )
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.paused_until = 0.0
+        self.waiters: list[_Waiter] = []
+
+    def wait_time(self, tokens: float, now: float) -> float:
+        wait = self.paused_until - now
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        return wait
+
+    def take(self, tokens: float) -> None:
+        if self.requests is not None:
+            self.requests.charge(1)
+        if self.tokens is not None and tokens:
+            self.tokens.charge(tokens)
+
+
+class RateLimiter:
+    """Process-wide request and token budgets, one pair of buckets per key.
+
+    Callers wait in a priority queue per key: only the head of the queue may
+    take from the buckets, so an interactive turn queued after a batch job
+    still goes first. Keys without configured limits are never throttled.
+    ``acquire`` blocks the thread, ``aacquire`` only the calling task.
+    """
+
+    def __init__(self, limits: Optional[dict[str, tuple]] = None):
+        self._cond = threading.Condition()
+        self._limits: dict[str, _Limit] = {}
+        self._seq = itertools.count()
+        for key, (rpm, tpm) in (limits or {}).items():
+            self.configure(key, rpm, tpm)
+
+    def configure(
+        self,
+        key: str,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        burst: Optional[float] = None,
+    ) -> None:
+        """Set (or with no limits, remove) the budget of ``key``."""
+        with self._cond:
+            if requests_per_minute or tokens_per_minute:
+                self._limits[key] = _Limit(
+                    requests_per_minute, tokens_per_minute, burst
+                )
+            else:
+                self._limits.pop(key, None)
+            self._cond.notify_all()
+
+    def charge_tokens(self, key: str, tokens: float) -> None:
+        """Charge tokens used by a finished call against ``key``."""
+        with self._cond:
+            limit = self._limits.get(key)
+            if limit is not None and limit.tokens is not None:
+                limit.tokens.charge(tokens)
+
+    def pause(self, key: str, seconds: float) -> None:
+        """Hold every caller of ``key`` back, e.g. after a 429."""
+        with self._cond:
+            limit = self._limits.get(key)
+            if limit is not None:
+                limit.paused_until = max(limit.paused_until, time.monotonic() + seconds)
+
+    def _enqueue(self, key: str, wake=None) -> tuple[Optional[_Limit], _Waiter]:
+        limit = self._limits.get(key)
+        waiter = _Waiter(_priority.get(), next(self._seq), wake)
+        if limit is not None:
+            heapq.heappush(limit.waiters, waiter)
+        return limit, waiter
+
+    def _try_take(self, limit: _Limit, waiter: _Waiter, tokens: float):
+        """Take if ``waiter`` is at the head; else return how long to wait."""
+        if limit.waiters[0] is not waiter:
+            return None
+        wait = limit.wait_time(tokens, time.monotonic())
+        if wait <= 0:
+            limit.take(tokens)
+            heapq.heappop(limit.waiters)
+            return 0.0
+        return wait
+
+    def _leave(self, limit: _Limit, waiter: _Waiter) -> None:
+        if any(w is waiter for w in limit.waiters):
+            limit.waiters.remove(waiter)
+            heapq.heapify(limit.waiters)
+        # Whoever is at the head now may proceed
+        self._cond.notify_all()
+        if limit.waiters and limit.waiters[0].wake is not None:
+            limit.waiters[0].wake()
+
+    def acquire(
+        self,
+        key: str,
+        tokens: float = 0,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """Wait for a request (and ``tokens``) of budget; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            limit, waiter = self._enqueue(key)
+            if limit is None:
+                return True
+            try:
+                while True:
+                    wait = self._try_take(limit, waiter, tokens)
+                    if wait == 0:
+                        return True
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                self._leave(limit, waiter)
+
+    async def aacquire(
+        self,
+        key: str,
+        tokens: float = 0,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """Async ``acquire``: waits without blocking the event loop."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        with self._cond:
+            limit, waiter = self._enqueue(
+                key, lambda: loop.call_soon_threadsafe(event.set)
+            )
+        if limit is None:
+            return True
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_take(limit, waiter, tokens)
+                if wait == 0:
+                    return True
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    wait = remaining if wait is None else min(wait, remaining)
+                try:
+                    await asyncio.wait_for(event.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                event.clear()
+        finally:
+            with self._cond:
+                self._leave(limit, waiter)
+
+
+limiter = RateLimiter(DEFAULT_LIMITS)
+
+
+def _status(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is None:
+        # googleapiclient.errors.HttpError
+        status = getattr(getattr(error, "resp", None), "status", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the server asked to wait, from a Retry-After header."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers is None:
+        headers = getattr(error, "resp", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether ``error`` carries a status worth retrying (429, 5xx)."""
+    return _status(error) in RETRY_STATUSES
+
+
+def retry_delay(key: Optional[str], error: BaseException, attempt: int):
+    """Delay before the next attempt, or None if ``error`` is not retryable.
+
+    A 429 also pauses ``key`` for everyone sharing it.
+    """
+    status = _status(error)
+    if status not in RETRY_STATUSES:
+        return None
+    delay = backoff_delay(attempt)
+    server_delay = retry_after(error)
+    if server_delay is not None:
+        delay = max(delay, server_delay)
+    if key is not None and status == 429:
+        # Hold everyone back, not just this caller
+        limiter.pause(key, delay)
+    return delay
+
+
+def rate_limited(
+    key: str,
+    tokens: float = 0,
+    max_attempts: int = 5,
+    on_give_up: Optional[Callable[[Exception], Any]] = None,
+):
+    """Throttle a sync or async function under ``key`` and retry it on 429/5xx.
+
+    Every attempt waits for budget first; failed attempts back off with
+    jitter, at least as long as the server's Retry-After. The function must
+    let retryable errors escape for them to be retried (see
+    ``is_retryable``). Once the attempts are used up, the last error is
+    raised, or passed to ``on_give_up`` whose return value becomes the
+    result. Stack it under ``@tool`` to limit a tool:
+
+        @tool
+        @rate_limited("google_drive", on_give_up=lambda e: f"Drive is busy: {e}")
+        def list_google_drive_files(max_results: int = 10) -> str:
+            ...
+    """
+
+    def give_up(error: Exception):
+        if on_give_up is None or not is_retryable(error):
+            raise error
+        return on_give_up(error)
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                for attempt in itertools.count():
+                    await limiter.aacquire(key, tokens)
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as e:
+                        delay = retry_delay(key, e, attempt)
+                        if delay is None or attempt + 1 >= max_attempts:
+                            return give_up(e)
+                    await asyncio.sleep(delay)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in itertools.count():
+                limiter.acquire(key, tokens)
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    delay = retry_delay(key, e, attempt)
+                    if delay is None or attempt + 1 >= max_attempts:
+                        return give_up(e)
+                time.sleep(delay)
+
+        return wrapper
+
+    return decorator
+
+
+# "Error 429: Too Many Requests", as raised by the Tavily client
+_ERROR_STATUS = re.compile(r"\bError (\d{3})\b")
+
+
+class ErrorResult(Exception):
+    """A tool returned an error result instead of raising; retried like one."""
+
+    def __init__(self, result: Any, error: Any):
+        super().__init__(str(error))
+        self.result = result
+        self.status_code = _status(error) if isinstance(error, BaseException) else None
+        if self.status_code is None:
+            match = _ERROR_STATUS.search(str(error))
+            self.status_code = int(match.group(1)) if match else None
+
+
+def _check_result(result: Any) -> Any:
+    # Tools like TavilySearch catch their errors and return {"error": e}
+    if isinstance(result, dict) and result.get("error") is not None:
+        error = ErrorResult(result, result["error"])
+        if is_retryable(error):
+            raise error
+    return result
+
+
+def _last_result(error: Exception) -> Any:
+    if isinstance(error, ErrorResult):
+        return error.result
+    raise error
+
+
+class RateLimitedTool(BaseTool):
+    """Wrap a tool so its calls are throttled and retried under ``key``.
+
+    Errors raised by the tool are retried on 429/5xx, and so are error
+    results (``{"error": ...}``) carrying such a status; when the attempts
+    are used up, the last error result is returned as the tool's answer.
+
+    Example:
+
+        search = RateLimitedTool(TavilySearch(max_results=2), key="tavily")
+    """
+
+    tool: BaseTool
+    key: str
+    max_attempts: int = 5
+
+    def __init__(self, tool: BaseTool, **kwargs):
+        kwargs.setdefault("name", tool.name)
+        kwargs.setdefault("description", tool.description)
+        kwargs.setdefault("args_schema", tool.args_schema)
+        super().__init__(tool=tool, **kwargs)
+
+    def _child_config(self, config: RunnableConfig, run_manager) -> RunnableConfig:
+        # The inner run shows up under this one in traces and metrics
+        return patch_config(
+            config, callbacks=run_manager.get_child() if run_manager else None
+        )
+
+    def _run(self, config: RunnableConfig, run_manager=None, **kwargs) -> Any:
+        child = self._child_config(config, run_manager)
+
+        def invoke(tool_input):
+            return _check_result(self.tool.invoke(tool_input, child))
+
+        call = rate_limited(
+            self.key, max_attempts=self.max_attempts, on_give_up=_last_result
+        )(invoke)
+        return call(kwargs)
+
+    async def _arun(self, config: RunnableConfig, run_manager=None, **kwargs) -> Any:
+        child = self._child_config(config, run_manager)
+
+        async def ainvoke(tool_input):
+            return _check_result(await self.tool.ainvoke(tool_input, child))
+
+        call = rate_limited(
+            self.key, max_attempts=self.max_attempts, on_give_up=_last_result
+        )(ainvoke)
+        return await call(kwargs)
+
+
+class ModelRateLimiter(BaseRateLimiter):
+    """``rate_limiter`` for chat models, drawing on the shared ``limiter``.
+
+    A call is admitted while the key's token budget is not in debt; the
+    tokens it actually used are charged afterwards by ``TokenUsageHandler``.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        return limiter.acquire(self.key, timeout=None if blocking else 0)
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        return await limiter.aacquire(self.key, timeout=None if blocking else 0)
+
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """Charge a model's token usage to ``key`` and pause the key on 429s."""
+
+    def __init__(self, key: str):
+        self.key = key
+
+    def on_llm_end(self, response: Any, **kwargs: Any) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(
+                    getattr(generation, "message", None), "usage_metadata", None
+                )
+                if usage:
+                    limiter.charge_tokens(self.key, usage["total_tokens"])
+
+    def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
+        if _status(error) == 429:
+            limiter.pause(self.key, retry_after(error) or backoff_delay(3))
+
+
+def model_rate_limits(provider: str) -> dict[str, Any]:
+    """Keyword arguments adding the shared limits to a chat model.
+
+    Failed calls are retried by the provider's SDK (OpenAI and Anthropic
+    alike), ``MODEL_MAX_RETRIES`` times with jittered exponential backoff
+    that honours Retry-After; ``rate_limited`` is not stacked on top, so a
+    call is retried in one layer only. A 429 that is still failing after
+    those retries pauses ``provider`` for every caller.
+
+    Example:
+
+        model = init_chat_model(
+            "gpt-4o-mini", model_provider="openai", **model_rate_limits("openai")
+        )
+    """
+    return {
+        "rate_limiter": ModelRateLimiter(provider),
+        "callbacks": [TokenUsageHandler(provider)],
+        "max_retries": MODEL_MAX_RETRIES,
+    }
@@ -0,0 +1,124 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+
+class LRUSQLiteCache(BaseCache):
+    """Chat model response cache with an in-memory LRU in front of SQLite.
+
+    Entries are keyed on the serialized prompt (the rendered message list)
+    and the llm string (model name plus sampling params), so any change to
+    either results in a miss.
+
+    Both levels hold at most ``maxsize`` entries younger than ``ttl``
+    seconds; the table drops its oldest rows on write.
+
+    Pass an instance as ``cache=`` to ``init_chat_model``.
+    """
+
+    def __init__(
+        self,
+        database_path: str = ".langchain_cache.db",
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, tuple[float, RETURN_VAL_TYPE]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(database_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA mmap_size=67108864")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_created ON responses (created)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{prompt}\x00{llm_string}".encode("utf-8")).hexdigest()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _remember(self, key: str, created: float, value: RETURN_VAL_TYPE) -> None:
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                # Fall back to the persistent store and promote to memory
+                row = self._conn.execute(
+                    "SELECT value, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    entry = (row[1], [loads(gen) for gen in row[0].split("\x1e")])
+                    self._remember(key, *entry)
+            if entry is None or self._expired(entry[0]):
+                if entry is not None:
+                    self._memory.pop(key, None)
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self._key(prompt, llm_string)
+        created = time.time()
+        value = "\x1e".join(dumps(gen) for gen in return_val)
+        with self._lock:
+            self._remember(key, created, return_val)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created) VALUES (?, ?, ?)",
+                (key, value, created),
+            )
+            self._evict(created)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        if self.ttl is not None:
+            self._conn.execute(
+                "DELETE FROM responses WHERE created < ?", (now - self.ttl,)
+            )
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+            "ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.maxsize,),
+        )
+
+    def clear(self, **kwargs) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current in-memory size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._memory),
+            }
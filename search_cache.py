@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Optional
+
+from langchain_core.tools import BaseTool
+from pydantic import PrivateAttr
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a search query."""
+    return " ".join(query.lower().split())
+
+
+class CachedSearchTool(BaseTool):
+    """Wrap a search tool with a TTL cache and single-flight coalescing.
+
+    Results are cached per normalized query (plus the other tool arguments)
+    for ``ttl`` seconds. When several callers ask for the same query while the
+    upstream call is still running, only the first one calls the wrapped tool
+    and the others wait for its result. Errors are shared with the waiters
+    but never cached.
+
+    The wrapper keeps the wrapped tool's name, description and argument
+    schema, so the model sees the same tool.
+
+    Example:
+
+        search = CachedSearchTool(tool=TavilySearch(max_results=2), ttl=600)
+    """
+
+    tool: BaseTool
+    ttl: float = 600.0
+    maxsize: int = 512
+
+    _cache: OrderedDict = PrivateAttr(default_factory=OrderedDict)
+    _in_flight: dict = PrivateAttr(default_factory=dict)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _stats: dict = PrivateAttr(
+        default_factory=lambda: {"hits": 0, "misses": 0, "coalesced": 0}
+    )
+
+    def __init__(self, tool: BaseTool, **kwargs):
+        kwargs.setdefault("name", tool.name)
+        kwargs.setdefault("description", tool.description)
+        kwargs.setdefault("args_schema", tool.args_schema)
+        super().__init__(tool=tool, **kwargs)
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "size": len(self._cache)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def _key(self, kwargs: dict) -> tuple:
+        args = dict(kwargs)
+        query = normalize_query(args.pop("query", ""))
+        return (query, tuple(sorted((k, repr(v)) for k, v in args.items())))
+
+    def _claim(self, key: tuple) -> tuple[Optional[Future], bool]:
+        """Return the future to wait on and whether this caller must fill it."""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._cache.move_to_end(key)
+                    self._stats["hits"] += 1
+                    done: Future = Future()
+                    done.set_result(value)
+                    return done, False
+                del self._cache[key]
+            if key in self._in_flight:
+                self._stats["coalesced"] += 1
+                return self._in_flight[key], False
+            self._stats["misses"] += 1
+            future: Future = Future()
+            self._in_flight[key] = future
+            return future, True
+
+    def _settle(
+        self, key: tuple, future: Future, value: Any, error: Optional[BaseException]
+    ) -> None:
+        with self._lock:
+            del self._in_flight[key]
+            if error is None and not (isinstance(value, dict) and "error" in value):
+                self._cache[key] = (time.monotonic() + self.ttl, value)
+                while len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+        if error is None:
+            future.set_result(value)
+        else:
+            future.set_exception(error)
+
+    def _run(self, run_manager=None, **kwargs) -> Any:
+        key = self._key(kwargs)
+        future, leader = self._claim(key)
+        if leader:
+            try:
+                value = self.tool.invoke(kwargs)
+            except BaseException as e:
+                self._settle(key, future, None, e)
+                raise
+            self._settle(key, future, value, None)
+            return value
+        return future.result()
+
+    async def _arun(self, run_manager=None, **kwargs) -> Any:
+        key = self._key(kwargs)
+        future, leader = self._claim(key)
+        if leader:
+            try:
+                value = await self.tool.ainvoke(kwargs)
+            except BaseException as e:
+                self._settle(key, future, None, e)
+                raise
+            self._settle(key, future, value, None)
+            return value
+        return await asyncio.wrap_future(future)
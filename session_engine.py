@@ -0,0 +1,81 @@
+import asyncio
+from typing import Any, Optional
+
+
+class EngineClosed(RuntimeError):
+    """Raised when a turn is submitted to an engine that is shutting down."""
+
+
+class ChatSessionEngine:
+    """Serve many conversations concurrently on top of a compiled graph.
+
+    Turns of the same ``thread_id`` run one after another so they never race
+    on the checkpointer, while different threads run in parallel. At most
+    ``max_concurrency`` turns call the graph at the same time and at most
+    ``max_pending`` turns may be queued or running; ``submit`` waits for a
+    free slot once that limit is reached.
+
+    Example:
+
+        engine = ChatSessionEngine(app)
+        output = await engine.submit("thread-1", {"messages": [HumanMessage("Hi")]})
+        await engine.close()
+    """
+
+    def __init__(self, app, max_concurrency: int = 64, max_pending: int = 1024):
+        self.app = app
+        self._running = asyncio.Semaphore(max_concurrency)
+        self._pending = asyncio.Semaphore(max_pending)
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._waiters: dict[str, int] = {}
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._closing = False
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def submit(
+        self, thread_id: str, inputs: dict, config: Optional[dict] = None
+    ) -> Any:
+        """Run one turn for ``thread_id`` and return the graph output."""
+        if self._closing:
+            raise EngineClosed("engine is shutting down")
+        config = {**(config or {})}
+        config["configurable"] = {
+            **config.get("configurable", {}),
+            "thread_id": thread_id,
+        }
+
+        async with self._pending:
+            # Re-check after waiting for a slot, close() may have started
+            if self._closing:
+                raise EngineClosed("engine is shutting down")
+            self._in_flight += 1
+            self._idle.clear()
+            lock = self._locks.setdefault(thread_id, asyncio.Lock())
+            self._waiters[thread_id] = self._waiters.get(thread_id, 0) + 1
+            try:
+                async with lock, self._running:
+                    return await self.app.ainvoke(inputs, config)
+            finally:
+                self._waiters[thread_id] -= 1
+                if not self._waiters[thread_id]:
+                    del self._waiters[thread_id]
+                    del self._locks[thread_id]
+                self._in_flight -= 1
+                if not self._in_flight:
+                    self._idle.set()
+
+    async def close(self, timeout: Optional[float] = None) -> None:
+        """Stop accepting turns and wait for in-flight ones to finish."""
+        self._closing = True
+        await asyncio.wait_for(self._idle.wait(), timeout)
+
+    async def __aenter__(self) -> "ChatSessionEngine":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
@@ -1,5 +1,6 @@
 # Import relevant functionality
 from langchain_tavily import TavilySearch
+from search_cache import CachedSearchTool
 from langchain_core.messages import HumanMessage
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.prebuilt import create_react_agent
@@ -11,7 +12,8 @@ load_dotenv()
 # Create the agent
 memory = MemorySaver()
 model = init_chat_model("gpt-4o-mini", model_provider="openai")
-search = TavilySearch(max_results=2)
+# Cache search results for 10 minutes and coalesce identical in-flight queries
+search = CachedSearchTool(TavilySearch(max_results=2), ttl=600)
 tools = [search]
 agent_executor = create_react_agent(model, tools, checkpointer=memory)
 
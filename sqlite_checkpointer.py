@@ -0,0 +1,612 @@
+import asyncio
+import json
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterator, Sequence
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.types import TASKS, ChannelProtocol
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS messages (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    key TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, key)
+) WITHOUT ROWID;
+"""
+
+# Blob type of a channel version stored as a delta over the message store
+DELTA = "delta"
+
+# Maximum number of keys in one SQL IN (...) list
+SQL_BATCH = 500
+
+
+@dataclass
+class _Manifest:
+    """Message keys of one channel version, with the messages they resolve to."""
+
+    version: str
+    keys: list[str]
+    messages: list[Any]
+    depth: int
+
+
+class SQLiteSaver(BaseCheckpointSaver[str]):
+    """Drop-in replacement for ``MemorySaver`` that keeps checkpoints on disk.
+
+    Checkpoints are stored in a SQLite database in WAL mode using the
+    msgpack-based serializer of langgraph. A thread's state is only read when
+    that thread is resumed; the one thing kept in process memory is a bounded
+    LRU of message manifests (see below), so the resident size does not grow
+    with the number of conversations.
+
+    Writes are committed in batches: every ``commit_every`` operations or
+    ``commit_interval`` seconds after the first uncommitted write, whichever
+    comes first (a timer commits an idle session's last writes), and on
+    ``flush()`` / ``close()``. Reads go through the same connection, so they
+    always see uncommitted writes.
+
+    Message lists (the ``delta_channels``) are not rewritten in full at every
+    step. Each message is serialized once into an append-only per-thread
+    message store, and a channel version only records which prefix of an
+    earlier version it keeps and which stored messages follow, so a turn
+    costs in proportion to its new messages. Every ``snapshot_every`` deltas
+    a version lists all its message keys instead, which bounds the chain
+    replayed on read. The manifests of the ``cache_size`` most recently used
+    (thread, channel) pairs, with their messages, are kept in memory, so
+    resuming such a thread does not deserialize its history again.
+
+    Args:
+        path: Database file, created if it does not exist.
+        commit_every: Number of writes buffered before committing.
+        commit_interval: Maximum age in seconds of an uncommitted write.
+        delta_channels: Channels holding message lists to store as deltas.
+        snapshot_every: Maximum number of deltas between two full manifests.
+        cache_size: Number of (thread, channel) manifests kept in memory.
+        serde: Serializer for checkpoints, defaults to langgraph's.
+    """
+
+    def __init__(
+        self,
+        path: str = "checkpoints.db",
+        *,
+        commit_every: int = 32,
+        commit_interval: float = 1.0,
+        delta_channels: Sequence[str] = ("messages",),
+        snapshot_every: int = 32,
+        cache_size: int = 128,
+        serde: Optional[SerializerProtocol] = None,
+    ) -> None:
+        super().__init__(serde=serde)
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self.delta_channels = set(delta_channels)
+        self.snapshot_every = snapshot_every
+        self.cache_size = cache_size
+        self._manifests: OrderedDict[tuple[str, str, str], _Manifest] = OrderedDict()
+        self._pending = 0
+        self._last_commit = time.monotonic()
+        self._timer: Optional[threading.Timer] = None
+        self._closed = False
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def __enter__(self) -> "SQLiteSaver":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def flush(self) -> None:
+        """Commit all buffered writes."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._closed:
+                return
+            self.conn.commit()
+            self._pending = 0
+            self._last_commit = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            self._closed = True
+            self.conn.close()
+
+    def _wrote(self) -> None:
+        self._pending += 1
+        if (
+            self._pending >= self.commit_every
+            or time.monotonic() - self._last_commit >= self.commit_interval
+        ):
+            self.flush()
+        elif self._timer is None:
+            # Commit this write even if no other one follows
+            self._timer = threading.Timer(self.commit_interval, self._flush_pending)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_pending(self) -> None:
+        with self._lock:
+            self._timer = None
+            if self._pending:
+                self.flush()
+
+    def _load_blobs(
+        self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions
+    ) -> dict[str, Any]:
+        channel_values: dict[str, Any] = {}
+        for channel, version in versions.items():
+            row = self.conn.execute(
+                "SELECT type, blob FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? "
+                "AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if row is None or row[0] == "empty":
+                continue
+            if row[0] == DELTA:
+                channel_values[channel] = self._load_delta(
+                    thread_id, checkpoint_ns, channel, str(version), row[1]
+                )
+            else:
+                channel_values[channel] = self.serde.loads_typed(row)
+        return channel_values
+
+    def _remember(self, cache_key: tuple[str, str, str], manifest: _Manifest) -> None:
+        self._manifests[cache_key] = manifest
+        self._manifests.move_to_end(cache_key)
+        while len(self._manifests) > self.cache_size:
+            self._manifests.popitem(last=False)
+
+    def _load_delta(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        channel: str,
+        version: str,
+        record: bytes,
+    ) -> list[Any]:
+        cache_key = (thread_id, checkpoint_ns, channel)
+        cached = self._manifests.get(cache_key)
+        if cached is not None and cached.version == version:
+            self._manifests.move_to_end(cache_key)
+            return list(cached.messages)
+
+        # Walk back to a full manifest (or the cached version), then replay
+        head = json.loads(record)
+        chain = [head]
+        keys: Optional[list[str]] = None
+        while keys is None:
+            base = chain[-1].get("base")
+            if base is None:
+                keys = chain.pop()["keys"]
+            elif cached is not None and cached.version == base:
+                keys = cached.keys
+            else:
+                row = self.conn.execute(
+                    "SELECT blob FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "AND channel = ? AND version = ?",
+                    (thread_id, checkpoint_ns, channel, base),
+                ).fetchone()
+                chain.append(json.loads(row[0]))
+        for delta in reversed(chain):
+            keys = keys[: delta["keep"]] + delta["append"]
+
+        known = dict(zip(cached.keys, cached.messages)) if cached else {}
+        missing = [key for key in keys if key not in known]
+        for start in range(0, len(missing), SQL_BATCH):
+            batch = missing[start : start + SQL_BATCH]
+            rows = self.conn.execute(
+                "SELECT key, type, blob FROM messages WHERE thread_id = ? "
+                f"AND checkpoint_ns = ? AND key IN ({', '.join('?' * len(batch))})",
+                (thread_id, checkpoint_ns, *batch),
+            ).fetchall()
+            for key, type_, blob in rows:
+                known[key] = self.serde.loads_typed((type_, blob))
+        messages = [known[key] for key in keys]
+        self._remember(
+            cache_key, _Manifest(version, keys, messages, head.get("depth", 0))
+        )
+        return list(messages)
+
+    def _put_delta(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        channel: str,
+        version: str,
+        messages: list[Any],
+    ) -> tuple[str, bytes]:
+        cache_key = (thread_id, checkpoint_ns, channel)
+        base = self._manifests.get(cache_key)
+        # Messages carried over from the base version are the same objects
+        keep = 0
+        if base is not None:
+            for old, new in zip(base.messages, messages):
+                if old is not new:
+                    break
+                keep += 1
+        appended = [f"{channel}:{version}:{i}" for i in range(keep, len(messages))]
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO messages VALUES (?, ?, ?, ?, ?)",
+            [
+                (thread_id, checkpoint_ns, key, *self.serde.dumps_typed(message))
+                for key, message in zip(appended, messages[keep:])
+            ],
+        )
+        keys = (base.keys[:keep] if base else []) + appended
+        if base is None or base.depth + 1 >= self.snapshot_every:
+            record, depth = {"base": None, "keys": keys}, 0
+        else:
+            depth = base.depth + 1
+            record = {
+                "base": base.version,
+                "keep": keep,
+                "append": appended,
+                "depth": depth,
+            }
+        self._remember(cache_key, _Manifest(version, keys, list(messages), depth))
+        return DELTA, json.dumps(record).encode()
+
+    def _load_writes(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> list[tuple[str, str, Any]]:
+        rows = self.conn.execute(
+            "SELECT task_id, channel, type, value FROM writes WHERE thread_id = ? "
+            "AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return [
+            (task_id, channel, self.serde.loads_typed((type_, value)))
+            for task_id, channel, type_, value in rows
+        ]
+
+    def _load_sends(
+        self, thread_id: str, checkpoint_ns: str, parent_checkpoint_id: Optional[str]
+    ) -> list[Any]:
+        if not parent_checkpoint_id:
+            return []
+        rows = self.conn.execute(
+            "SELECT type, value FROM writes WHERE thread_id = ? AND checkpoint_ns = ? "
+            "AND checkpoint_id = ? AND channel = ? ORDER BY task_path, task_id, idx",
+            (thread_id, checkpoint_ns, parent_checkpoint_id, TASKS),
+        ).fetchall()
+        return [self.serde.loads_typed(row) for row in rows]
+
+    def _make_tuple(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        parent_checkpoint_id: Optional[str],
+        checkpoint: tuple[str, bytes],
+        metadata: CheckpointMetadata,
+    ) -> CheckpointTuple:
+        checkpoint_: Checkpoint = self.serde.loads_typed(checkpoint)
+        loaded = {
+            **checkpoint_,
+            "channel_values": self._load_blobs(
+                thread_id, checkpoint_ns, checkpoint_["channel_versions"]
+            ),
+        }
+        # Before format v4 pending sends were kept as writes of the parent;
+        # later versions carry them in channel_values and have no such key
+        if checkpoint_.get("v", 0) < 4:
+            loaded["pending_sends"] = self._load_sends(
+                thread_id, checkpoint_ns, parent_checkpoint_id
+            )
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=loaded,
+            metadata=metadata,
+            pending_writes=self._load_writes(thread_id, checkpoint_ns, checkpoint_id),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id: str = config["configurable"]["thread_id"]
+        checkpoint_ns: str = config["configurable"].get("checkpoint_ns", "")
+        query = (
+            "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+            "metadata_type, metadata FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ?"
+        )
+        params: tuple = (thread_id, checkpoint_ns)
+        if checkpoint_id := get_checkpoint_id(config):
+            query += " AND checkpoint_id = ?"
+            params += (checkpoint_id,)
+        else:
+            query += " ORDER BY checkpoint_id DESC LIMIT 1"
+        with self._lock:
+            row = self.conn.execute(query, params).fetchone()
+            if row is None:
+                return None
+            checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata = row
+            return self._make_tuple(
+                thread_id,
+                checkpoint_ns,
+                checkpoint_id,
+                parent_id,
+                (type_, checkpoint),
+                self.serde.loads_typed((metadata_type, metadata)),
+            )
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (
+                checkpoint_ns := config["configurable"].get("checkpoint_ns")
+            ) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_checkpoint_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_checkpoint_id)
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "type, checkpoint, metadata_type, metadata FROM checkpoints"
+        )
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+        for row in rows:
+            thread_id, checkpoint_ns, checkpoint_id, parent_id = row[:4]
+            metadata = self.serde.loads_typed((row[6], row[7]))
+            # filter by metadata
+            if filter and not all(
+                query_value == metadata.get(query_key)
+                for query_key, query_value in filter.items()
+            ):
+                continue
+
+            # limit search results
+            if limit is not None and limit <= 0:
+                break
+            elif limit is not None:
+                limit -= 1
+
+            with self._lock:
+                checkpoint_tuple = self._make_tuple(
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint_id,
+                    parent_id,
+                    (row[4], row[5]),
+                    metadata,
+                )
+            # Not under the lock: the caller's loop may take any time
+            yield checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        c = checkpoint.copy()
+        c.pop("pending_sends", None)  # type: ignore[misc]
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        values: dict[str, Any] = c.pop("channel_values")  # type: ignore[misc]
+        with self._lock:
+            blobs = []
+            for k, v in new_versions.items():
+                if k not in values:
+                    typed = ("empty", b"")
+                elif k in self.delta_channels and isinstance(values[k], list):
+                    typed = self._put_delta(
+                        thread_id, checkpoint_ns, k, str(v), values[k]
+                    )
+                else:
+                    typed = self.serde.dumps_typed(values[k])
+                blobs.append((thread_id, checkpoint_ns, k, str(v), *typed))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),  # parent
+                    *self.serde.dumps_typed(c),
+                    *self.serde.dumps_typed(get_checkpoint_metadata(config, metadata)),
+                ),
+            )
+            self._wrote()
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = [
+            (
+                thread_id,
+                checkpoint_ns,
+                checkpoint_id,
+                task_id,
+                WRITES_IDX_MAP.get(c, idx),
+                c,
+                *self.serde.dumps_typed(v),
+                task_path,
+            )
+            for idx, (c, v) in enumerate(writes)
+        ]
+        with self._lock:
+            # Special writes (errors, interrupts) replace, regular ones are kept once
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [row for row in rows if row[4] < 0],
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [row for row in rows if row[4] >= 0],
+            )
+            self._wrote()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            for table in ("checkpoints", "blobs", "writes", "messages"):
+                self.conn.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,)
+                )
+            for key in [key for key in self._manifests if key[0] == thread_id]:
+                del self._manifests[key]
+            self.flush()
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return await asyncio.to_thread(
+            self.put_writes, config, writes, task_id, task_path
+        )
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: ChannelProtocol) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        next_v = current_v + 1
+        next_h = random.random()
+        return f"{next_v:032}.{next_h:016}"
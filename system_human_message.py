@@ -2,12 +2,16 @@
 from dotenv import load_dotenv
 from langchain.chat_models import init_chat_model
 from langchain_core.messages import HumanMessage, SystemMessage
+from response_cache import LRUSQLiteCache
 
 load_dotenv()
+response_cache = LRUSQLiteCache(maxsize=256, ttl=7 * 24 * 3600)
 
 
 def main():
-    model = init_chat_model("gpt-4o-mini", model_provider="openai")
+    model = init_chat_model(
+        "gpt-4o-mini", model_provider="openai", cache=response_cache
+    )
 
     messages = [
         SystemMessage("Translate the following from Polish to English"),
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from drive_index import DriveMetadataIndex
+from fake_drive import FakeDriveService
+
+
+@pytest.fixture
+def drive():
+    service = FakeDriveService()
+    service.add_file("Quarterly report", modified_time="2026-01-01T10:00:00.000Z")
+    service.add_file("Weather notes", modified_time="2026-01-02T10:00:00.000Z")
+    return service
+
+
+@pytest.fixture
+def index(drive, tmp_path):
+    index = DriveMetadataIndex(drive, path=str(tmp_path / "index.db"), max_age=60)
+    index.sync()
+    return index
+
+
+def names(files):
+    return sorted(f["name"] for f in files)
+
+
+def test_first_sync_seeds_the_index(drive, index):
+    assert names(index.recent()) == ["Quarterly report", "Weather notes"]
+    assert names(index.search("quart")) == ["Quarterly report"]
+
+
+def test_sync_applies_only_the_new_changes(drive, index):
+    added = drive.add_file("Trip plan")
+    drive.files().update(fileId="file1", body={"name": "Annual report"}).execute()
+    drive.remove_file("file2")
+    drive.calls = 0
+
+    assert index.sync(force=True) == 3
+    # One page of the changes feed, no listing
+    assert drive.calls == 1
+    assert names(index.recent()) == ["Annual report", "Trip plan"]
+    assert index.get(added["id"])["name"] == "Trip plan"
+    assert index.search("weather") == []
+
+
+def test_sync_is_throttled_by_max_age(drive, index):
+    drive.add_file("Trip plan")
+    drive.calls = 0
+
+    assert index.sync() == 0
+    assert drive.calls == 0
+    assert index.search("trip") == []
+
+    assert index.sync(force=True) == 1
+    assert names(index.search("trip")) == ["Trip plan"]
+
+
+def test_sync_resumes_from_the_stored_page_token(drive, index, tmp_path):
+    drive.add_file("Trip plan")
+    index.conn.close()
+
+    reopened = DriveMetadataIndex(drive, path=str(tmp_path / "index.db"), max_age=0)
+    drive.calls = 0
+    assert reopened.sync() == 1
+    assert drive.calls == 1
+    assert names(reopened.recent()) == [
+        "Quarterly report",
+        "Trip plan",
+        "Weather notes",
+    ]
+
+
+def test_stale_change_does_not_undo_own_write(drive, index):
+    index.record(
+        {
+            "id": "file1",
+            "name": "Renamed locally",
+            "mimeType": "text/plain",
+            "modifiedTime": "2026-03-01T10:00:00.000Z",
+        }
+    )
+    drive.files_by_id["file1"]["modifiedTime"] = "2026-02-01T10:00:00.000Z"
+    drive.change_log.append(("file1", False))
+
+    index.sync(force=True)
+    assert index.get("file1")["name"] == "Renamed locally"
+
+
+def test_modified_after_accepts_aware_datetimes(index):
+    after = datetime(2026, 1, 2, 12, 0, tzinfo=timezone(timedelta(hours=5)))
+    assert names(index.recent(modified_after=after)) == ["Weather notes"]
+    assert names(index.search("report", modified_after=after)) == []
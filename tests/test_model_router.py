@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import pytest
+
+from fake_chat_model import FakeChatModel
+from model_router import HedgedChatModel
+
+
+class FailingChatModel(FakeChatModel):
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise RuntimeError("backend down")
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise RuntimeError("backend down")
+
+
+def router(*backends, **kwargs):
+    kwargs.setdefault("default_hedge_delay", 0.05)
+    return HedgedChatModel(backends=list(backends), **kwargs)
+
+
+def tokens(message) -> int:
+    return len(message.content.split())
+
+
+@pytest.fixture
+def slow():
+    return FakeChatModel(latency=0.5, output_tokens=5, model_name="slow")
+
+
+@pytest.fixture
+def fast():
+    return FakeChatModel(latency=0.01, output_tokens=3, model_name="fast")
+
+
+def test_slow_call_is_hedged_and_first_answer_wins(slow, fast):
+    model = router(slow, fast)
+
+    started = time.monotonic()
+    reply = model.invoke("hi")
+
+    assert tokens(reply) == 3
+    assert time.monotonic() - started < 0.4
+    # The losing call never finished, so it leaves no latency sample
+    assert model.tracker.count(0) == 0
+    assert model.tracker.count(1) == 1
+
+
+def test_async_hedge_cancels_the_loser(slow, fast):
+    model = router(slow, fast)
+
+    started = time.monotonic()
+    reply = asyncio.run(model.ainvoke("hi"))
+
+    assert tokens(reply) == 3
+    assert time.monotonic() - started < 0.4
+    assert model.tracker.count(0) == 0
+    assert model.tracker.count(1) == 1
+
+
+def test_no_hedge_before_the_delay(slow, fast):
+    model = router(fast, slow, default_hedge_delay=1.0)
+
+    assert tokens(model.invoke("hi")) == 3
+    assert model.tracker.count(0) == 1
+    assert model.tracker.count(1) == 0
+
+
+def test_failure_falls_over_to_the_next_backend(fast):
+    model = router(FailingChatModel(), fast, default_hedge_delay=1.0)
+
+    assert tokens(model.invoke("hi")) == 3
+    assert model.tracker.quantile(0, 0.5) == model.error_penalty
+
+
+def test_all_backends_failing_raises():
+    model = router(FailingChatModel(), FailingChatModel())
+
+    with pytest.raises(RuntimeError, match="backend down"):
+        model.invoke("hi")
+
+
+def test_stream_races_on_the_first_chunk(slow, fast):
+    model = router(slow, fast)
+
+    chunks = [chunk.content for chunk in model.stream("hi")]
+
+    assert len(chunks) == 3
+    assert model.tracker.count((0, "ttft")) == 0
+    assert model.tracker.count((1, "ttft")) == 1
+
+
+def test_async_stream_races_on_the_first_chunk(slow, fast):
+    model = router(slow, fast)
+
+    async def run():
+        return [chunk.content async for chunk in model.astream("hi")]
+
+    assert len(asyncio.run(run())) == 3
+    assert model.tracker.count((0, "ttft")) == 0
+    assert model.tracker.count((1, "ttft")) == 1
+
+
+def test_measured_backends_are_ordered_by_median_latency(slow, fast):
+    model = router(slow, fast, min_samples=2)
+    for _ in range(2):
+        model.tracker.record(0, 0.5)
+        model.tracker.record(1, 0.01)
+
+    started = time.monotonic()
+    assert tokens(model.invoke("hi")) == 3
+    assert time.monotonic() - started < 0.4
+    assert model.tracker.count(0) == 2
@@ -0,0 +1,83 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from fake_search import FakeSearchTool
+from search_cache import CachedSearchTool
+
+
+class FailingSearchTool(FakeSearchTool):
+    def _run(self, query: str, run_manager=None):
+        self.calls += 1
+        raise RuntimeError("upstream down")
+
+
+def test_concurrent_identical_queries_are_coalesced():
+    upstream = FakeSearchTool(latency=0.2)
+    search = CachedSearchTool(tool=upstream)
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(
+            pool.map(lambda _: search.invoke({"query": "Weather in Paris"}), range(8))
+        )
+
+    assert upstream.calls == 1
+    assert all(result == results[0] for result in results)
+    assert search.stats["misses"] == 1
+    assert search.stats["coalesced"] + search.stats["hits"] == 7
+
+
+def test_async_identical_queries_are_coalesced():
+    upstream = FakeSearchTool(latency=0.2)
+    search = CachedSearchTool(tool=upstream)
+
+    async def run():
+        return await asyncio.gather(
+            *(search.ainvoke({"query": "weather in paris"}) for _ in range(8))
+        )
+
+    results = asyncio.run(run())
+    assert upstream.calls == 1
+    assert search.stats["coalesced"] == 7
+    assert all(result == results[0] for result in results)
+
+
+def test_normalized_queries_share_a_cache_entry():
+    upstream = FakeSearchTool(latency=0)
+    search = CachedSearchTool(tool=upstream)
+
+    search.invoke({"query": "Weather in Paris"})
+    search.invoke({"query": "  weather   in paris "})
+    assert upstream.calls == 1
+    assert search.stats["hits"] == 1
+
+    search.invoke({"query": "weather in Rome"})
+    assert upstream.calls == 2
+
+
+def test_entries_expire_after_ttl():
+    upstream = FakeSearchTool(latency=0)
+    search = CachedSearchTool(tool=upstream, ttl=0)
+
+    search.invoke({"query": "weather"})
+    search.invoke({"query": "weather"})
+    assert upstream.calls == 2
+
+
+def test_errors_are_shared_but_not_cached():
+    upstream = FailingSearchTool(latency=0)
+    search = CachedSearchTool(tool=upstream)
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            search.invoke({"query": "weather"})
+    assert upstream.calls == 2
+    assert search.stats["size"] == 0
+
+
+def test_keeps_the_wrapped_tool_schema():
+    upstream = FakeSearchTool()
+    search = CachedSearchTool(tool=upstream)
+    assert search.name == upstream.name
+    assert search.args_schema is upstream.args_schema
@@ -0,0 +1,214 @@
+import json
+from collections import OrderedDict
+from typing import Callable, Hashable, Sequence
+
+import tiktoken
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+# OpenAI chat format: every message costs 3 tokens on top of its fields, a
+# name 1 more, and the reply is primed with 3
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_NAME = 1
+TOKENS_PER_TOOL_CALL_ID = 3
+REPLY_PRIMING = 3
+
+_ROLES = {"human": "user", "ai": "assistant"}
+
+
+def tiktoken_counter(
+    model_name: str = "gpt-4o-mini",
+) -> Callable[[list[BaseMessage]], int]:
+    """Token counter for OpenAI chat models, computed locally with tiktoken.
+
+    Counts like ``ChatOpenAI.get_num_tokens_from_messages`` (text content),
+    so trimming with it matches ``trim_messages(token_counter=model)``. The
+    encoding is loaded on first use; tiktoken caches it on disk.
+    """
+    encoding = None
+
+    def count(messages: list[BaseMessage]) -> int:
+        nonlocal encoding
+        if encoding is None:
+            try:
+                encoding = tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                encoding = tiktoken.get_encoding("cl100k_base")
+        tokens = REPLY_PRIMING
+        for message in messages:
+            tokens += TOKENS_PER_MESSAGE
+            tokens += len(encoding.encode(_ROLES.get(message.type, message.type)))
+            tokens += len(encoding.encode(message.text()))
+            if message.name:
+                tokens += len(encoding.encode(message.name)) + TOKENS_PER_NAME
+            for call in getattr(message, "tool_calls", None) or []:
+                tokens += len(encoding.encode(call["name"]))
+                tokens += len(encoding.encode(json.dumps(call["args"])))
+            if getattr(message, "tool_call_id", None):
+                tokens += TOKENS_PER_TOOL_CALL_ID
+        return tokens
+
+    return count
+
+
+def _fingerprint(message: BaseMessage) -> int:
+    return hash(
+        (
+            message.type,
+            repr(message.content),
+            repr(message.tool_calls) if hasattr(message, "tool_calls") else None,
+        )
+    )
+
+
+class _Window:
+    """Sliding window over one conversation's history."""
+
+    def __init__(self):
+        # message id -> (content fingerprint, token count)
+        self.counts: dict[str, tuple[int, int]] = {}
+        self.length = 0
+        self.last_id = None
+        self.start = 0
+        self.start_id = None
+        # (id, fingerprint) of the newest message dropped from the window
+        self.dropped = None
+        self.total = 0
+
+
+class IncrementalTrimmer:
+    """Keep the latest messages that fit in ``max_tokens``, counted incrementally.
+
+    Behaves like ``trim_messages(strategy="last", include_system=...,
+    start_on="human", allow_partial=False)`` but remembers, per conversation,
+    the token count of every message in the window and the running total. A
+    turn only counts the messages appended since the previous one, and the
+    window start only ever moves forward, so trimming costs O(new messages).
+
+    If the history was rewritten (messages removed, or replaced under the
+    same id) the window is rebuilt for that turn; counts are keyed on the
+    message content, so only the replaced messages are counted again.
+
+    Messages are charged ``token_counter([message]) - token_counter([])``,
+    the fixed per-list cost (reply priming) once per list, so the window is
+    the one ``trim_messages`` picks with the same counter.
+
+    Args:
+        max_tokens: Token budget for the trimmed history.
+        token_counter: Counts tokens of a list of messages, runs locally;
+            defaults to ``tiktoken_counter()``.
+        include_system: Keep a leading system message and charge it to the budget.
+        start_on: Message type the trimmed history must start on.
+        max_windows: Number of conversations whose window is kept.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int,
+        token_counter: Callable[[list[BaseMessage]], int] | None = None,
+        include_system: bool = True,
+        start_on: type[BaseMessage] = HumanMessage,
+        max_windows: int = 1024,
+    ):
+        self.max_tokens = max_tokens
+        self.token_counter = token_counter or tiktoken_counter()
+        self.include_system = include_system
+        self.start_on = start_on
+        self.max_windows = max_windows
+        self._overhead: int | None = None
+        self._windows: OrderedDict[Hashable, _Window] = OrderedDict()
+
+    def _message_tokens(self, message: BaseMessage) -> int:
+        if self._overhead is None:
+            self._overhead = self.token_counter([])
+        return self.token_counter([message]) - self._overhead
+
+    def _count(self, window: _Window, message: BaseMessage) -> int:
+        if message.id is None:
+            return self._message_tokens(message)
+        fingerprint = _fingerprint(message)
+        cached = window.counts.get(message.id)
+        if cached is None or cached[0] != fingerprint:
+            cached = window.counts[message.id] = (
+                fingerprint,
+                self._message_tokens(message),
+            )
+        return cached[1]
+
+    def _is_extension(self, window: _Window, messages: Sequence[BaseMessage]) -> bool:
+        if not (
+            window.length > 0
+            and len(messages) >= window.length
+            and messages[window.length - 1].id == window.last_id
+            and (
+                window.start == window.length
+                or messages[window.start].id == window.start_id
+            )
+        ):
+            return False
+        # A message replaced in the window changes the total, and one
+        # replaced just before it may fit again
+        if window.dropped is not None:
+            before = messages[window.start - 1]
+            if (before.id, _fingerprint(before)) != window.dropped:
+                return False
+        for message in messages[window.start : window.length]:
+            cached = window.counts.get(message.id)
+            if cached is not None and cached[0] != _fingerprint(message):
+                return False
+        return True
+
+    def trim(
+        self, messages: Sequence[BaseMessage], key: Hashable = None
+    ) -> list[BaseMessage]:
+        """Trim ``messages``, reusing the window kept under ``key``."""
+        if not messages:
+            return []
+        system = None
+        if self.include_system and isinstance(messages[0], SystemMessage):
+            system = messages[0]
+        offset = 1 if system is not None else 0
+        # As trim_messages: the system message is counted on its own, the
+        # rest as one list, so the fixed cost is charged to both
+        budget = self.max_tokens
+        if system is not None:
+            budget = max(0, budget - self.token_counter([system]))
+        budget = max(0, budget - self.token_counter([]))
+
+        window = self._windows.get(key)
+        if window is None or not self._is_extension(window, messages):
+            counts = window.counts if window is not None else {}
+            window = self._windows[key] = _Window()
+            window.counts = {m.id: counts[m.id] for m in messages if m.id in counts}
+            window.start = offset
+            new = messages[offset:]
+            while len(self._windows) > self.max_windows:
+                self._windows.popitem(last=False)
+        else:
+            self._windows.move_to_end(key)
+            new = messages[window.length :]
+
+        for message in new:
+            window.total += self._count(window, message)
+        # Drop the oldest messages until the rest fits
+        while window.start < len(messages) and window.total > budget:
+            dropped = messages[window.start]
+            window.total -= self._count(window, dropped)
+            window.counts.pop(dropped.id, None)
+            window.dropped = (dropped.id, _fingerprint(dropped))
+            window.start += 1
+
+        window.length = len(messages)
+        window.last_id = messages[-1].id
+        window.start_id = (
+            messages[window.start].id if window.start < len(messages) else None
+        )
+
+        first = window.start
+        while first < len(messages) and not isinstance(messages[first], self.start_on):
+            first += 1
+        kept = list(messages[first:])
+        return [system, *kept] if system is not None else kept
+
+    def forget(self, key: Hashable) -> None:
+        """Drop the cached window of a conversation."""
+        self._windows.pop(key, None)
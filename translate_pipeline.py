@@ -0,0 +1,290 @@
+"""Translate a large corpus into one or more languages.
+
+Records are streamed from a JSONL file (one object per line, text under
+``--text-field``) or a plain text file (one record per non-empty line), so the
+input is never loaded whole. Translations are written to a JSONL file as they
+finish, and every finished (record, language) pair is recorded in a SQLite
+progress file; running the same command again after a crash skips those pairs.
+
+    python translate_pipeline.py corpus.jsonl -o out.jsonl -l English,German
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Iterator, Optional
+
+from dotenv import load_dotenv
+from langchain_core.prompts import ChatPromptTemplate
+
+from model_router import init_hedged_model
+from rate_limits import BATCH, priority
+
+# Seconds between two progress lines
+REPORT_INTERVAL = 5.0
+
+prompt_template = ChatPromptTemplate.from_messages(
+    [
+        ("system", "Translate the following from {source} into {language}"),
+        ("user", "{text}"),
+    ]
+)
+
+
+def read_records(
+    path: str, text_field: str = "text", id_field: str = "id"
+) -> Iterator[tuple[str, str, dict]]:
+    """Yield ``(record id, text, record)`` lazily from a JSONL or text file.
+
+    Records without an id field are identified by their line number.
+    """
+    jsonl = path.endswith((".jsonl", ".ndjson"))
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.rstrip("\n")
+            if not line.strip():
+                continue
+            if jsonl:
+                record = json.loads(line)
+                text = record[text_field]
+            else:
+                record, text = {}, line
+            yield str(record.get(id_field, number)), text, record
+
+
+class Progress:
+    """Finished ``(record id, language)`` pairs, kept on disk in SQLite.
+
+    Lookups go to the database, so memory use does not grow with the corpus.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        # Each pair is committed, but only checkpoints wait for the disk
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS done (record_id TEXT, language TEXT, "
+            "PRIMARY KEY (record_id, language)) WITHOUT ROWID"
+        )
+        self.conn.commit()
+
+    def __contains__(self, key: tuple[str, str]) -> bool:
+        return (
+            self.conn.execute(
+                "SELECT 1 FROM done WHERE record_id = ? AND language = ?", key
+            ).fetchone()
+            is not None
+        )
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM done").fetchone()[0]
+
+    def add(self, record_id: str, language: str) -> None:
+        self.conn.execute(
+            "INSERT OR IGNORE INTO done VALUES (?, ?)", (record_id, language)
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def open_output(path: str):
+    """Open ``path`` for appending, dropping a line cut off by a crash."""
+    if os.path.exists(path):
+        with open(path, "rb+") as f:
+            data_end = f.seek(0, os.SEEK_END)
+            if data_end:
+                # Walk back to the last newline
+                position = data_end
+                while position > 0:
+                    step = min(position, 64 * 1024)
+                    f.seek(position - step)
+                    chunk = f.read(step)
+                    newline = chunk.rfind(b"\n")
+                    if newline != -1:
+                        position = position - step + newline + 1
+                        break
+                    position -= step
+                if position != data_end:
+                    f.truncate(position)
+    return open(path, "a", encoding="utf-8")
+
+
+class Throughput:
+    """Count finished records and translations and report their rates.
+
+    A record counts once all its languages are translated; each
+    (record, language) pair is one translation.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.reported = self.started
+        self.records = 0
+        self.translations = 0
+        self.failed = 0
+
+    def add(self, record_done: bool = False) -> None:
+        self.translations += 1
+        if record_done:
+            self.records += 1
+        now = time.monotonic()
+        if now - self.reported >= REPORT_INTERVAL:
+            self.reported = now
+            self.report()
+
+    def rate(self, count: int) -> float:
+        elapsed = time.monotonic() - self.started
+        return count / elapsed if elapsed > 0 else 0.0
+
+    def report(self, final: bool = False) -> None:
+        label = "Done" if final else "Progress"
+        print(
+            f"{label}: {self.records} records, {self.translations} translations in "
+            f"{time.monotonic() - self.started:.1f}s "
+            f"({self.rate(self.records):.1f} records/sec, "
+            f"{self.rate(self.translations):.1f} translations/sec)"
+            + (f", {self.failed} failed" if self.failed else ""),
+            file=sys.stderr,
+        )
+
+
+async def translate_records(
+    model,
+    records: Iterator[tuple[str, str, dict]],
+    languages: list[str],
+    output,
+    progress: Progress,
+    source: str = "Polish",
+    concurrency: int = 8,
+    throughput: Optional[Throughput] = None,
+) -> Throughput:
+    """Translate every record into every language with bounded concurrency.
+
+    At most ``concurrency`` translations are in flight and the input is only
+    read as fast as they finish, so memory use does not grow with the corpus.
+
+    A failed translation is reported and skipped, but an error writing the
+    results stops the run: no new translations are started and it is raised
+    once those in flight have finished.
+    """
+    throughput = throughput or Throughput()
+    slots = asyncio.Semaphore(concurrency)
+    tasks: set[asyncio.Task] = set()
+    errors: list[BaseException] = []
+    # Languages still to translate, per record in flight
+    remaining: dict[str, int] = {}
+
+    def finished(task: asyncio.Task) -> None:
+        tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            errors.append(task.exception())
+
+    async def translate(record_id: str, text: str, record: dict, language: str):
+        try:
+            prompt = prompt_template.invoke(
+                {"source": source, "language": language, "text": text}
+            )
+            response = await model.ainvoke(prompt)
+        except Exception as e:
+            throughput.failed += 1
+            # The record will not be complete in this run
+            remaining.pop(record_id, None)
+            print(f"{record_id} ({language}): {e}", file=sys.stderr)
+            return
+        finally:
+            slots.release()
+        result = {**record, "id": record_id, "language": language}
+        result["translation"] = response.content
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output.flush()
+        # Only after the result is on disk: a crash may repeat it, never lose it
+        progress.add(record_id, language)
+        record_done = False
+        if record_id in remaining:
+            remaining[record_id] -= 1
+            if remaining[record_id] == 0:
+                del remaining[record_id]
+                record_done = True
+        throughput.add(record_done)
+
+    with priority(BATCH):
+        for record_id, text, record in records:
+            todo = [lang for lang in languages if (record_id, lang) not in progress]
+            if todo:
+                remaining[record_id] = len(todo)
+            for language in todo:
+                await slots.acquire()
+                if errors:
+                    slots.release()
+                    break
+                task = asyncio.create_task(translate(record_id, text, record, language))
+                tasks.add(task)
+                task.add_done_callback(finished)
+            if errors:
+                break
+        if tasks:
+            await asyncio.wait(tasks)
+    if errors:
+        raise errors[0]
+    return throughput
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL or text file to translate")
+    parser.add_argument("-o", "--output", required=True, help="JSONL results file")
+    parser.add_argument(
+        "-l", "--languages", required=True, help="comma-separated target languages"
+    )
+    parser.add_argument("--source", default="Polish", help="language of the input")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--model",
+        default="openai:gpt-4o-mini",
+        help='comma-separated "provider:model" list (several are hedged)',
+    )
+    parser.add_argument(
+        "--progress", help="progress database (default: <output>.progress.db)"
+    )
+    args = parser.parse_args()
+
+    load_dotenv()
+    model = init_hedged_model(args.model)
+    languages = [lang.strip() for lang in args.languages.split(",") if lang.strip()]
+    progress = Progress(args.progress or f"{args.output}.progress.db")
+    if done := len(progress):
+        print(f"Resuming: {done} translations done", file=sys.stderr)
+
+    throughput = Throughput()
+    output = open_output(args.output)
+    try:
+        asyncio.run(
+            translate_records(
+                model,
+                read_records(args.input, args.text_field, args.id_field),
+                languages,
+                output,
+                progress,
+                source=args.source,
+                concurrency=args.concurrency,
+                throughput=throughput,
+            )
+        )
+    finally:
+        output.close()
+        progress.close()
+        throughput.report(final=True)
+
+
+if __name__ == "__main__":
+    main()
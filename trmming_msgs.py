@@ -1,26 +1,36 @@
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import START, MessagesState, StateGraph
 from langchain.chat_models import init_chat_model
 from dotenv import load_dotenv
+from sqlite_checkpointer import SQLiteSaver
+from instrumentation import Instrumentation
+from console_stream import print_reply
 from langchain_core.messages import HumanMessage
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.prompts import ChatPromptTemplate
 from typing import Sequence
 from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages
 from typing_extensions import Annotated, TypedDict
-from langchain_core.messages import SystemMessage, trim_messages
+from langchain_core.runnables import RunnableConfig
+from token_trimming import IncrementalTrimmer, tiktoken_counter
+from prompt_prefix import PrefixCachedPrompt, supports_cache_control
+from rate_limits import model_rate_limits
 
 load_dotenv()
-model = init_chat_model("gpt-4o-mini", model_provider="openai")
-
-prompt_template = ChatPromptTemplate.from_messages(
-    [
-        (
-            "system",
-            "You are a helpful assistant. Answer all questions to the best of your ability in {language}.",
-        ),
-        MessagesPlaceholder(variable_name="messages"),
-    ]
+model = init_chat_model(
+    "gpt-4o-mini", model_provider="openai", **model_rate_limits("openai")
+)
+
+# Rendered once per language, so every request starts with the same prefix
+system_prompt = PrefixCachedPrompt(
+    ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                "You are a helpful assistant. Answer all questions to the best of your ability in {language}.",
+            ),
+        ]
+    ),
+    cache_control=supports_cache_control(model),
 )
 
 
@@ -30,29 +40,29 @@ class State(TypedDict):
     language: str
 
 
-# Define the function that calls the model
-def call_model(state: State):
-
-    trimmer = trim_messages(
-        max_tokens=65,
-        strategy="last",
-        token_counter=model,
-        include_system=True,
-        allow_partial=False,
-        start_on="human",
-    )
+# Trimmer keeping a per-thread running token count, counted offline with
+# the model's tiktoken encoding
+trimmer = IncrementalTrimmer(
+    max_tokens=65,
+    token_counter=tiktoken_counter("gpt-4o-mini"),
+    include_system=True,
+    start_on=HumanMessage,
+)
 
-    trimmed_messages = trimmer.invoke(state["messages"])
 
-    prompt = prompt_template.invoke(
-        {"messages": trimmed_messages, "language": state["language"]}
+# Define the function that calls the model
+def call_model(state: State, config: RunnableConfig):
+    trimmed_messages = trimmer.trim(
+        state["messages"], key=config["configurable"]["thread_id"]
     )
+
+    prompt = system_prompt.render(trimmed_messages, language=state["language"])
     response = model.invoke(prompt)
 
     return {"messages": [response]}
 
 
-def main():
+def build_app(checkpointer):
     # Define a new graph
     workflow = StateGraph(state_schema=State)
 
@@ -60,32 +70,49 @@ def main():
     workflow.add_edge(START, "model")
     workflow.add_node("model", call_model)
 
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def main():
+    # Timings are collected when METRICS_FILE or METRICS_PORT is set
+    metrics = Instrumentation.from_env().start()
+
     # Add memory
-    memory = MemorySaver()
-    app = workflow.compile(checkpointer=memory)
+    memory = metrics.checkpointer(SQLiteSaver("trmming_msgs_checkpoints.db"))
+    app = build_app(memory)
 
     # Set config
-    config = {"configurable": {"thread_id": "abc123"}}
+    config = {
+        "configurable": {"thread_id": "abc123"},
+        "callbacks": metrics.callbacks(),
+    }
 
     # Set Language
     language = ""
 
-    while True:
-        if not language:
-            language = input("Language preference: ")
-            query = input("You: ")
-            input_messages = [HumanMessage(query)]
-            output = app.invoke(
-                {"messages": input_messages, "language": language}, config
-            )
-        else:
-            query = input("You: ")
-            if query.lower() == "quit":
-                break
-            input_messages = [HumanMessage(query)]
-            output = app.invoke({"messages": input_messages}, config)
-
-        output["messages"][-1].pretty_print()
+    try:
+        while True:
+            if not language:
+                language = input("Language preference: ")
+                query = input("You: ")
+                input_messages = [HumanMessage(query)]
+                inputs = {"messages": input_messages, "language": language}
+            else:
+                query = input("You: ")
+                if query.lower() == "quit":
+                    break
+                input_messages = [HumanMessage(query)]
+                inputs = {"messages": input_messages}
+
+            # Prints the reply token by token as it is generated
+            print_reply(app, inputs, config)
+    except (EOFError, KeyboardInterrupt):
+        # Ctrl-D / Ctrl-C end the session like "quit"
+        print()
+    finally:
+        # Commit the buffered checkpoints, so the conversation survives a restart
+        memory.close()
+        metrics.close()
 
 
 if __name__ == "__main__":
@@ -1,104 +1,112 @@
 # Import relevant functionality
 from langchain_tavily import TavilySearch
+from search_cache import CachedSearchTool
+from parallel_tools import ParallelToolNode
+from instrumentation import Instrumentation
+from rate_limits import RateLimitedTool, is_retryable, model_rate_limits, rate_limited
 from langchain_core.messages import HumanMessage
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.prebuilt import create_react_agent
 from langchain_openai import ChatOpenAI
 from langchain.tools import tool
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload, MediaIoBaseDownload
+from drive_auth import authorize_drive, get_drive_service, run_in_drive_pool
+from drive_client import delete_many
+from drive_index import DriveMetadataIndex
+from drive_query import build_query, iter_files
+from drive_streaming import SpooledDownload, decode_text_range, iter_media_chunks
+from content_cache import ContentCache, content_version
+from drive_upload import execute_upload, media_from_bytes
+from doc_retrieval import DocumentIndexCache, format_chunks
+from langchain.embeddings import init_embeddings
 import os
-import pickle
-import io
+import threading
 from typing import Optional, List, Dict
 from dotenv import load_dotenv
 from datetime import datetime
 
 load_dotenv()
 
-# Google Drive OAuth2 setup
-SCOPES = ['https://www.googleapis.com/auth/drive']
+# Bytes fetched per ranged request when reading files
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
 
-def authenticate_google_drive():
-    """Authenticate and return Google Drive service object"""
-    creds = None
-    
-    # Token file stores the user's access and refresh tokens
-    if os.path.exists('token.pickle'):
-        with open('token.pickle', 'rb') as token:
-            creds = pickle.load(token)
-    
-    # If there are no (valid) credentials available, let the user log in
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            # Create the flow using the client secrets file
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'credentials.json',  # Download this from Google Cloud Console
-                SCOPES
-            )
-            
-            try:
-                # Try to run local server without opening browser
-                creds = flow.run_local_server(
-                    port=0,  # Use any available port
-                    open_browser=False  # Don't try to open browser automatically
-                )
-            except Exception:
-                # Fall back to manual authentication
-                print("\n=== Manual Google Drive Authentication ===")
-                auth_url, _ = flow.authorization_url(
-                    access_type='offline',
-                    include_granted_scopes='true'
-                )
-                
-                print(f"\n1. Open this URL in your browser:\n{auth_url}")
-                print("\n2. Grant permissions and copy the authorization code")
-                code = input("\n3. Enter the authorization code here: ")
-                
-                # Exchange code for token
-                flow.fetch_token(code=code)
-                creds = flow.credentials
-        
-        # Save the credentials for the next run
-        with open('token.pickle', 'wb') as token:
-            pickle.dump(creds, token)
+# Files up to this size are downloaded whole on first read, so later reads come from the cache
+CACHE_WHOLE_FILE_BYTES = 4 * 1024 * 1024
+
+# Compressed copies of downloaded contents, per file version
+content_cache = ContentCache()
+
+# Most characters of a document indexed for question answering
+MAX_INDEXED_CHARS = 5_000_000
+
+# Indexes of documents read with a question, per file version.
+# Set DOC_EMBEDDINGS (e.g. "openai:text-embedding-3-small") to add vector search to BM25.
+document_indexes = DocumentIndexCache(
+    embeddings=init_embeddings(os.environ['DOC_EMBEDDINGS']) if os.getenv('DOC_EMBEDDINGS') else None
+)
+
+# Local metadata index answering searches and listings, synced via the changes feed.
+# Like the Drive service itself, it is only created on first tool use.
+_drive_index = None
+_drive_index_lock = threading.Lock()
+
+def get_drive_index():
+    """Return the shared Drive metadata index, creating it on first use"""
+    global _drive_index
+    with _drive_index_lock:
+        if _drive_index is None:
+            # Each call uses the calling thread's own Drive service
+            _drive_index = DriveMetadataIndex(get_drive_service)
+    return _drive_index
+
+def async_drive_tool(drive_tool):
+    """Add an async variant to a sync Drive tool.
+
+    The async variant runs the tool on the Drive worker pool, where every worker
+    has its own Drive service, so many sessions can call Drive in parallel.
+    """
+    async def coroutine(**kwargs):
+        return await run_in_drive_pool(drive_tool.func, **kwargs)
     
-    return build('drive', 'v3', credentials=creds)
+    drive_tool.coroutine = coroutine
+    return drive_tool
 
-# Initialize Google Drive service
-try:
-    drive_service = authenticate_google_drive()
-    print("Google Drive authentication successful!")
-except Exception as e:
-    print(f"Google Drive authentication failed: {e}")
-    print("Please ensure you have credentials.json from Google Cloud Console")
-    drive_service = None
+def drive_unavailable(error):
+    """Tool answer once Drive kept failing with 429 or 5xx"""
+    return f"Google Drive is unavailable right now, try again later: {str(error)}"
 
 # Custom Google Drive Tools
+@async_drive_tool
 @tool
-def search_google_drive(query: str, file_type: Optional[str] = None) -> str:
+@rate_limited('google_drive', on_give_up=drive_unavailable)
+def search_google_drive(
+    query: str,
+    file_type: Optional[str] = None,
+    max_results: int = 10,
+    folder_id: Optional[str] = None,
+    modified_after: Optional[str] = None,
+    search_content: bool = False,
+) -> str:
     """
     Search for files in Google Drive.
     
     Args:
         query: Search query string
         file_type: Optional file type filter (e.g., 'pdf', 'docx', 'sheet', 'doc')
+        max_results: Maximum number of files to return
+        folder_id: Optional ID of the folder to search in
+        modified_after: Optional date or RFC 3339 time, only files modified later are returned
+        search_content: Also match the query against file contents, not just names
     
     Returns:
         String with search results
     """
+    drive_service = get_drive_service()
     if not drive_service:
         return "Google Drive is not authenticated. Please set up credentials.json"
+    drive_index = get_drive_index()
     
     try:
-        # Build query
-        drive_query = f"name contains '{query}'"
-        
+        mime_type = None
         if file_type:
             mime_types = {
                 'pdf': 'application/pdf',
@@ -109,46 +117,75 @@ def search_google_drive(query: str, file_type: Optional[str] = None) -> str:
                 'slide': 'application/vnd.google-apps.presentation',
                 'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
             }
-            if file_type.lower() in mime_types:
-                drive_query += f" and mimeType='{mime_types[file_type.lower()]}'"
+            mime_type = mime_types.get(file_type.lower())
         
-        # Execute search
-        results = drive_service.files().list(
-            q=drive_query,
-            pageSize=10,
-            fields="files(id, name, mimeType, modifiedTime, size)"
-        ).execute()
+        if folder_id or search_content:
+            # The local index knows neither folders nor contents: ask Drive,
+            # fetching pages only until max_results files have come in
+            q = build_query(
+                name_contains=None if search_content else query,
+                full_text=query if search_content else None,
+                mime_type=mime_type,
+                modified_after=modified_after,
+                parent=folder_id,
+            )
+            files = iter_files(drive_service, q, fields='id, name, mimeType', limit=max_results)
+        else:
+            # Search the local index, only the changes since the last sync hit the API
+            drive_index.sync()
+            files = drive_index.search(
+                query, mime_type=mime_type, modified_after=modified_after, limit=max_results
+            )
         
-        files = results.get('files', [])
-        if not files:
+        # Format the files as they come in
+        file_list = [
+            f"- {f['name']} (ID: {f['id']}, Type: {f['mimeType'].split('.')[-1]})"
+            for f in files
+        ]
+        if not file_list:
             return "No files found matching your search."
         
-        file_list = []
-        for f in files:
-            file_info = f"- {f['name']} (ID: {f['id']}, Type: {f['mimeType'].split('.')[-1]})"
-            file_list.append(file_info)
-        
-        return f"Found {len(files)} files:\n" + "\n".join(file_list)
+        return f"Found {len(file_list)} files:\n" + "\n".join(file_list)
     except Exception as e:
+        # Let the rate limiter retry 429s and 5xx first
+        if is_retryable(e):
+            raise
         return f"Error searching Google Drive: {str(e)}"
 
+@async_drive_tool
 @tool
-def read_google_drive_file(file_id: str) -> str:
+@rate_limited('google_drive', on_give_up=drive_unavailable)
+def read_google_drive_file(
+    file_id: str,
+    offset: int = 0,
+    max_chars: int = 20000,
+    question: Optional[str] = None,
+    top_k: int = 4,
+) -> str:
     """
-    Read content from a Google Drive file.
+    Read content from a Google Drive file, one page at a time.
+    
+    Prefer passing a question: only the passages relevant to it are returned
+    instead of the whole document.
     
     Args:
         file_id: The ID of the file to read
+        offset: Byte offset to start reading from (use the offset returned by a previous read to continue)
+        max_chars: Maximum number of characters to return
+        question: Optional question about the file, returns the most relevant passages only
+        top_k: Number of passages to return for a question
     
     Returns:
         The content of the file as a string
     """
+    drive_service = get_drive_service()
     if not drive_service:
         return "Google Drive is not authenticated. Please set up credentials.json"
     
+    download = None
     try:
         # Get file metadata
-        file = drive_service.files().get(fileId=file_id).execute()
+        file = drive_service.files().get(fileId=file_id, fields='name, mimeType, modifiedTime, md5Checksum, size').execute()
         mime_type = file.get('mimeType', '')
         file_name = file.get('name', 'Unknown')
         
@@ -172,27 +209,65 @@ def read_google_drive_file(file_id: str) -> str:
             # For other files, download as is
             request = drive_service.files().get_media(fileId=file_id)
         
-        # Download file content
-        file_content = io.BytesIO()
-        downloader = MediaIoBaseDownload(file_content, request)
-        done = False
-        while not done:
-            _, done = downloader.next_chunk()
+        # Unchanged contents come from the local cache: the metadata get above is the only call
+        version = content_version(file)
+        cached = content_cache.get(file_id, version)
+        if cached is None and (
+            mime_type.startswith('application/vnd.google-apps.')
+            or int(file.get('size') or 0) <= CACHE_WHOLE_FILE_BYTES
+        ):
+            # Exports come back whole anyway, small files are fetched whole to be cached
+            download = SpooledDownload(request, DOWNLOAD_CHUNK_SIZE, CACHE_WHOLE_FILE_BYTES)
+            cached = content_cache.put(file_id, version, download)
         
-        file_content.seek(0)
-        content = file_content.read()
+        def chunks(start):
+            if cached is not None:
+                return cached.iter_chunks(start, DOWNLOAD_CHUNK_SIZE)
+            if download is not None:
+                # Too large to cache: reuse what was fetched instead of downloading again
+                return download.iter_chunks(start)
+            return iter_media_chunks(request, DOWNLOAD_CHUNK_SIZE, start)
+        
+        if question:
+            def load_text():
+                text, _, _ = decode_text_range(chunks(0), max_chars=MAX_INDEXED_CHARS)
+                return text
+            
+            # Downloaded and indexed once per version of the file
+            try:
+                index = document_indexes.get(file_id, file.get('modifiedTime'), load_text)
+            except UnicodeDecodeError:
+                return f"'{file_name}' is a binary file"
+            return format_chunks(file_name, index.search(question, top_k=top_k), len(index.chunks))
         
-        # Try to decode as text
+        # Stream the content chunk by chunk, stopping once max_chars is reached
         try:
-            text_content = content.decode('utf-8')
-            return f"Content of '{file_name}':\n\n{text_content}"
-        except:
-            return f"'{file_name}' is a binary file (size: {len(content)} bytes)"
+            text_content, next_offset, total = decode_text_range(
+                chunks(offset), offset=offset, max_chars=max_chars
+            )
+        except UnicodeDecodeError:
+            return f"'{file_name}' is a binary file"
+        
+        header = f"Content of '{file_name}'"
+        if offset or total is None or next_offset < total:
+            header += f" (bytes {offset}-{next_offset} of {total if total is not None else 'unknown'})"
+        result = f"{header}:\n\n{text_content}"
+        if total is not None and next_offset < total:
+            result += f"\n\n[Truncated. Call again with offset={next_offset} to read more.]"
+        return result
             
     except Exception as e:
+        # Let the rate limiter retry 429s and 5xx first
+        if is_retryable(e):
+            raise
         return f"Error reading file: {str(e)}"
+    finally:
+        if download is not None:
+            download.close()
 
+@async_drive_tool
 @tool
+@rate_limited('google_drive', on_give_up=drive_unavailable)
 def create_google_drive_file(name: str, content: str, file_type: str = 'text') -> str:
     """
     Create a new file in Google Drive.
@@ -205,52 +280,49 @@ def create_google_drive_file(name: str, content: str, file_type: str = 'text') -
     Returns:
         Success message with file details
     """
+    drive_service = get_drive_service()
     if not drive_service:
         return "Google Drive is not authenticated. Please set up credentials.json"
+    drive_index = get_drive_index()
     
     try:
         # Create file metadata
         file_metadata = {'name': name}
         
         # Handle different file types
+        # Small contents go up in one multipart request, large ones in resumable chunks
         if file_type == 'google-doc':
             file_metadata['mimeType'] = 'application/vnd.google-apps.document'
-            media = MediaIoBaseUpload(
-                io.BytesIO(content.encode('utf-8')),
-                mimetype='text/plain',
-                resumable=True
-            )
+            media = media_from_bytes(content.encode('utf-8'), mimetype='text/plain')
         elif file_type == 'google-sheet':
             file_metadata['mimeType'] = 'application/vnd.google-apps.spreadsheet'
-            media = MediaIoBaseUpload(
-                io.BytesIO(content.encode('utf-8')),
-                mimetype='text/csv',
-                resumable=True
-            )
+            media = media_from_bytes(content.encode('utf-8'), mimetype='text/csv')
         else:
             # Default to text file
             if not name.endswith('.txt'):
                 name += '.txt'
                 file_metadata['name'] = name
-            media = MediaIoBaseUpload(
-                io.BytesIO(content.encode('utf-8')),
-                mimetype='text/plain',
-                resumable=True
-            )
+            media = media_from_bytes(content.encode('utf-8'), mimetype='text/plain')
         
-        # Create file
-        file = drive_service.files().create(
+        # Create file; retries are left to the rate limiter around this tool
+        file = execute_upload(drive_service.files().create(
             body=file_metadata,
             media_body=media,
-            fields='id, name, webViewLink'
-        ).execute()
+            fields='id, name, webViewLink, mimeType, modifiedTime, size'
+        ), num_retries=0, max_attempts=1)
+        drive_index.record(file)
         
         return f"Successfully created file '{file.get('name')}'\nFile ID: {file.get('id')}\nView link: {file.get('webViewLink', 'No link available')}"
     except Exception as e:
+        # Let the rate limiter retry 429s and 5xx first
+        if is_retryable(e):
+            raise
         return f"Error creating file: {str(e)}"
 
 # Also update the update_google_drive_file function:
+@async_drive_tool
 @tool
+@rate_limited('google_drive', on_give_up=drive_unavailable)
 def update_google_drive_file(file_id: str, new_content: str) -> str:
     """
     Update the content of an existing Google Drive file.
@@ -262,33 +334,33 @@ def update_google_drive_file(file_id: str, new_content: str) -> str:
     Returns:
         Success or error message
     """
+    drive_service = get_drive_service()
     if not drive_service:
         return "Google Drive is not authenticated. Please set up credentials.json"
+    drive_index = get_drive_index()
     
     try:
-        # Get current file metadata
-        file = drive_service.files().get(fileId=file_id).execute()
-        file_name = file.get('name', 'Unknown')
-        
-        # Prepare media upload
-        media = MediaIoBaseUpload(
-            io.BytesIO(new_content.encode('utf-8')),
-            mimetype='text/plain',
-            resumable=True
-        )
+        # Prepare media upload: multipart when small, resumable chunks when large
+        media = media_from_bytes(new_content.encode('utf-8'), mimetype='text/plain')
         
-        # Update file
-        updated_file = drive_service.files().update(
+        # Update file; retries are left to the rate limiter around this tool
+        updated_file = execute_upload(drive_service.files().update(
             fileId=file_id,
             media_body=media,
-            fields='id, name, modifiedTime'
-        ).execute()
+            fields='id, name, mimeType, modifiedTime, size'
+        ), num_retries=0, max_attempts=1)
+        drive_index.record(updated_file)
         
         return f"Successfully updated '{updated_file.get('name')}'\nModified at: {updated_file.get('modifiedTime')}"
     except Exception as e:
+        # Let the rate limiter retry 429s and 5xx first
+        if is_retryable(e):
+            raise
         return f"Error updating file: {str(e)}"
 
+@async_drive_tool
 @tool
+@rate_limited('google_drive', on_give_up=drive_unavailable)
 def delete_google_drive_file(file_id: str) -> str:
     """
     Delete a file from Google Drive.
@@ -299,21 +371,69 @@ def delete_google_drive_file(file_id: str) -> str:
     Returns:
         Success or error message
     """
+    drive_service = get_drive_service()
     if not drive_service:
         return "Google Drive is not authenticated. Please set up credentials.json"
+    drive_index = get_drive_index()
     
     try:
-        # Get file name before deletion
-        file = drive_service.files().get(fileId=file_id).execute()
-        file_name = file.get('name', 'Unknown')
+        # Take the name from the local index instead of an extra files().get
+        indexed = drive_index.get(file_id)
+        file_name = indexed['name'] if indexed else file_id
         
         # Delete file
         drive_service.files().delete(fileId=file_id).execute()
+        drive_index.forget(file_id)
+        content_cache.forget(file_id)
         return f"Successfully deleted '{file_name}'"
     except Exception as e:
+        # Let the rate limiter retry 429s and 5xx first
+        if is_retryable(e):
+            raise
         return f"Error deleting file: {str(e)}"
 
+@async_drive_tool
+@tool
+@rate_limited('google_drive', on_give_up=drive_unavailable)
+def delete_google_drive_files(file_ids: List[str]) -> str:
+    """
+    Delete several files from Google Drive at once.
+    
+    Args:
+        file_ids: IDs of the files to delete
+    
+    Returns:
+        Summary of deleted files and errors
+    """
+    drive_service = get_drive_service()
+    if not drive_service:
+        return "Google Drive is not authenticated. Please set up credentials.json"
+    drive_index = get_drive_index()
+    
+    try:
+        # All deletes go out in batched round trips
+        errors = delete_many(drive_service, file_ids)
+        
+        lines = []
+        for file_id, error in zip(file_ids, errors):
+            indexed = drive_index.get(file_id)
+            file_name = indexed['name'] if indexed else file_id
+            if error is None:
+                drive_index.forget(file_id)
+                content_cache.forget(file_id)
+                lines.append(f"- Deleted '{file_name}'")
+            else:
+                lines.append(f"- Failed to delete '{file_name}': {error}")
+        return "\n".join(lines)
+    except Exception as e:
+        # Let the rate limiter retry 429s and 5xx first
+        if is_retryable(e):
+            raise
+        return f"Error deleting files: {str(e)}"
+
+@async_drive_tool
 @tool
+@rate_limited('google_drive', on_give_up=drive_unavailable)
 def list_google_drive_files(max_results: int = 10) -> str:
     """
     List files in Google Drive.
@@ -324,25 +444,25 @@ def list_google_drive_files(max_results: int = 10) -> str:
     Returns:
         String with list of files
     """
+    drive_service = get_drive_service()
     if not drive_service:
         return "Google Drive is not authenticated. Please set up credentials.json"
+    drive_index = get_drive_index()
     
     try:
-        results = drive_service.files().list(
-            pageSize=max_results,
-            fields="files(id, name, mimeType, modifiedTime, size)",
-            orderBy="modifiedTime desc"
-        ).execute()
-        
-        files = results.get('files', [])
+        drive_index.sync()
+        files = drive_index.recent(limit=max_results)
         if not files:
             return "No files found in Google Drive."
         
         file_list = [f"Recent files in Google Drive (showing up to {max_results}):"]
         for f in files:
-            size = f.get('size', 'N/A')
-            if size != 'N/A':
-                size = f"{int(size) / 1024 / 1024:.2f} MB" if int(size) > 1024*1024 else f"{int(size) / 1024:.2f} KB"
+            # The index stores sizes as integers already
+            size = f.get('size')
+            if size is None:
+                size = 'N/A'
+            else:
+                size = f"{size / 1024 / 1024:.2f} MB" if size > 1024*1024 else f"{size / 1024:.2f} KB"
             
             modified = f.get('modifiedTime', 'Unknown')
             if modified != 'Unknown':
@@ -353,16 +473,22 @@ def list_google_drive_files(max_results: int = 10) -> str:
         
         return "\n".join(file_list)
     except Exception as e:
+        # Let the rate limiter retry 429s and 5xx first
+        if is_retryable(e):
+            raise
         return f"Error listing files: {str(e)}"
 
 # Create the agent with all tools
 memory = MemorySaver()
 
 # Initialize the model
-model = ChatOpenAI(model="gpt-4o-mini")
+# Shares the process-wide OpenAI request/token budget
+model = ChatOpenAI(model="gpt-4o-mini", **model_rate_limits("openai"))
 
 # Combine all tools
-search = TavilySearch(max_results=2)
+# Cache search results for 10 minutes and coalesce identical in-flight queries
+# Only cache misses count against the Tavily budget
+search = CachedSearchTool(RateLimitedTool(TavilySearch(max_results=2), key='tavily'), ttl=600)
 tools = [
     search,
     search_google_drive,
@@ -370,14 +496,26 @@ tools = [
     create_google_drive_file,
     update_google_drive_file,
     delete_google_drive_file,
+    delete_google_drive_files,
     list_google_drive_files
 ]
 
-agent_executor = create_react_agent(model, tools, checkpointer=memory)
+# Run the tool calls of one step concurrently, at most 2 searches at a time
+tool_node = ParallelToolNode(tools, max_workers=8, tool_concurrency={search.name: 2})
+
+agent_executor = create_react_agent(model, tool_node, checkpointer=memory)
 
 # Example usage
 if __name__ == "__main__":
-    config = {"configurable": {"thread_id": "abc123"}}
+    # Log in before the agent runs: the Drive tools never prompt for it
+    try:
+        authorize_drive()
+    except Exception:
+        pass
+    
+    # Node, tool and model timings, when METRICS_FILE or METRICS_PORT is set
+    metrics = Instrumentation.from_env().start()
+    config = {"configurable": {"thread_id": "abc123"}, "callbacks": metrics.callbacks()}
     
     # Initial greeting
     print("=== Greeting ===")
@@ -416,4 +554,6 @@ if __name__ == "__main__":
         config,
         stream_mode="values",
     ):
-        step["messages"][-1].pretty_print()
\ No newline at end of file
+        step["messages"][-1].pretty_print()
+
+    metrics.close()